@@ -0,0 +1,173 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+DEFAULT_REPLY = (
+    "Here is an example:\n\n```python\ndef add(a, b):\n    return a + b\n```\n\n"
+    "- It takes two arguments\n- It returns their sum\n\nUse `add(1, 2)` to try it."
+)
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 refuses connections under concurrent load,
+    # which would measure the stand-in instead of the client
+    request_queue_size = 1024
+    daemon_threads = True
+
+class FakeOpenAIServer:
+    """Local stand-in for the chat completions endpoint with configurable latency and errors."""
+    def __init__(
+        self,
+        latency: float = 0.05,
+        token_delay: float = 0.002,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        reply: str = DEFAULT_REPLY,
+        port: int = 0,
+        seed: Optional[int] = 0
+    ):
+        """
+        Initialize the fake server.
+
+        Args:
+            latency: Seconds before the response (or first streamed chunk) is sent
+            token_delay: Seconds between streamed chunks
+            error_rate: Fraction of requests answered with error_status
+            error_status: HTTP status used for injected errors (429 and 5xx are retried by the client)
+            reply: Text returned by every completion; streamed word by word
+            port: Port to listen on; 0 picks a free one
+            seed: Seed for the error injection, for reproducible runs
+        """
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FakeOpenAI", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload: dict):
+                data = f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                time.sleep(server.latency)
+                if server._should_fail():
+                    self._send_json(
+                        server.error_status,
+                        {"error": {"message": "injected error", "type": "benchmark"}},
+                        {"Retry-After": "0"}
+                    )
+                    return
+
+                model = body.get("model", "fake-model")
+                words = server.reply.split(" ")
+                prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 4 for m in body.get("messages", []))
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(words),
+                    "total_tokens": prompt_tokens + len(words),
+                }
+
+                if not body.get("stream"):
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": server.reply},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": usage,
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+                for i, word in enumerate(words):
+                    delta = word if i == 0 else " " + word
+                    self._chunk({**base, "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                self._chunk({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    self._chunk({**base, "choices": [], "usage": usage})
+                data = b"data: [DONE]\n\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeOpenAIServer(args.latency, args.token_delay, args.error_rate, port=args.port).start()
+    print(f"Serving on {fake.base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
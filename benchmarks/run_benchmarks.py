@@ -0,0 +1,430 @@
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+import numpy as np
+
+# Run from anywhere: the classes package lives one directory up
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classes.ChatBot import ChatBot, ChatBotConfig, create_client
+from classes.MessageDatabase import MessageDatabase, DatabaseConfig
+from classes.MessageFormatter import MessageFormatter
+from classes.RequestScheduler import RequestScheduler
+from classes.VectorIndex import HashingEmbedder, VectorIndex
+from fake_openai import FakeOpenAIServer
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = (
+    "python sqlite query index stream token latency cache model prompt answer "
+    "function class window thread queue batch export import search history"
+).split()
+# A Zipf-like vocabulary so full-text queries match realistic fractions of rows
+VOCABULARY = WORDS + [f"term{i}" for i in range(5000)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Summarize durations in seconds as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(q):
+        return ordered[max(int(q * len(ordered) + 0.5) - 1, 0)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(rank(0.50), 3),
+        "p95_ms": round(rank(0.95), 3),
+        "p99_ms": round(rank(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def max_rss_mb() -> float:
+    """Peak resident memory of this process so far, or 0 where unsupported."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1e6 if sys.platform == "darwin" else 1e3
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+def with_memory(func: Callable[[], Dict], trace: bool = False) -> Dict:
+    """
+    Run a benchmark and add memory use to its result.
+
+    The process's peak RSS is always recorded. With trace, the peak of
+    Python allocations is measured too; tracing slows everything down, so
+    timings from traced runs should not be compared with untraced ones.
+    """
+    if trace:
+        tracemalloc.start()
+    try:
+        result = func()
+        if trace:
+            result["peak_traced_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+    finally:
+        if trace:
+            tracemalloc.stop()
+    result["max_rss_mb"] = max_rss_mb()
+    return result
+
+def random_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=words))
+
+def bench_chat(server: FakeOpenAIServer, workdir: str, requests: int, concurrency: int, stream: bool) -> Dict:
+    """Send requests through ChatBot from a thread pool, one conversation per request."""
+    config = ChatBotConfig(base_url=server.base_url, max_retries=5)
+    client = create_client(config)
+    scheduler = RequestScheduler(max_retries=config.max_retries, base_delay=0.01, max_delay=0.1)
+    message_db = MessageDatabase(os.path.join(workdir, f"chat_{'stream' if stream else 'plain'}.db"),
+                                 DatabaseConfig(write_batch_size=64))
+    latencies, first_tokens, errors = [], [], 0
+    server.requests = server.errors = 0
+
+    def run_one(index: int):
+        chatbot = ChatBot(config, scheduler=scheduler, client=client, message_db=message_db)
+        started = time.perf_counter()
+        first_token = None
+        if stream:
+            for _ in chatbot.chat_stream(f"Question {index}: how do I add two numbers?"):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+        else:
+            chatbot.chat(f"Question {index}: how do I add two numbers?")
+        return time.perf_counter() - started, first_token
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run_one, i) for i in range(requests)]
+        for future in futures:
+            try:
+                latency, first_token = future.result()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(latency)
+            if first_token is not None:
+                first_tokens.append(first_token)
+    elapsed = time.perf_counter() - started
+    message_db.close()
+
+    result = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "errors": errors,
+        "server_requests": server.requests,
+        "injected_errors": server.errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency": percentiles(latencies),
+    }
+    if stream:
+        result["time_to_first_token"] = percentiles(first_tokens)
+    return result
+
+def bench_database(workdir: str, rows: int, queries: int, seed: int) -> Dict:
+    """Insert rows in batches, then time the reads the window and ChatBot issue."""
+    rng = random.Random(seed)
+    path = os.path.join(workdir, f"messages_{rows}.db")
+    message_db = MessageDatabase(path)
+    per_conversation = 500
+    batch_size = 1000
+
+    conversations = []
+    insert_elapsed = 0.0
+    inserted = 0
+    while inserted < rows:
+        if inserted % per_conversation == 0:
+            conversations.append(message_db.create_conversation(f"Benchmark {len(conversations)}"))
+        count = min(batch_size, rows - inserted, per_conversation - inserted % per_conversation)
+        # Generating the text is not part of what is measured
+        batch = [
+            {
+                "role": "user" if (inserted + i) % 2 == 0 else "assistant",
+                "content": random_text(rng, 30),
+                "metadata": {"model": "fake-model", "total_tokens": 40, "latency_ms": 100.0},
+                "conversation_id": conversations[-1],
+            }
+            for i in range(count)
+        ]
+        started = time.perf_counter()
+        message_db.add_messages(batch)
+        insert_elapsed += time.perf_counter() - started
+        inserted += count
+
+    # Single unbuffered inserts, as the window issues them
+    single = []
+    for i in range(min(queries, 500)):
+        content = random_text(rng, 30)
+        started = time.perf_counter()
+        message_db.add_message("user", content, conversation_id=conversations[-1])
+        single.append(time.perf_counter() - started)
+
+    def timed(func: Callable[[], object]) -> List[float]:
+        samples = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    max_id = rows
+    results = {
+        "rows": rows,
+        "insert_rows_per_sec": round(rows / insert_elapsed, 1),
+        "single_insert": percentiles(single),
+        "newest_page": percentiles(timed(lambda: message_db.get_messages_page(
+            limit=50, conversation_id=rng.choice(conversations)))),
+        "older_page": percentiles(timed(lambda: message_db.get_messages_page(
+            limit=50, before_id=rng.randint(1, max_id)))),
+        "count": percentiles(timed(lambda: message_db.get_message_count(
+            conversation_id=rng.choice(conversations)))),
+        "search": percentiles(timed(lambda: message_db.search(
+            random_text(rng, 2), limit=20))),
+    }
+    export_started = time.perf_counter()
+    exported = sum(len(chunk) for chunk in message_db.iter_messages(chunk_size=1000))
+    results["scan_rows_per_sec"] = round(exported / (time.perf_counter() - export_started), 1)
+    message_db.close()
+    results["file_size_mb"] = round(sum(
+        os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix)
+    ) / 1e6, 2)
+    return results
+
+def bench_formatter(messages: int, seed: int) -> Dict:
+    """Render distinct messages cold, then again from the formatter's cache."""
+    rng = random.Random(seed)
+    contents = [
+        f"{random_text(rng, 40)}\n\n```python\nprint({i})\n```\n\n- {random_text(rng, 5)}\n- `{rng.choice(WORDS)}`"
+        for i in range(messages)
+    ]
+    formatter = MessageFormatter(cache_size=messages)
+
+    started = time.perf_counter()
+    for i, content in enumerate(contents):
+        formatter.render(content, i)
+    cold = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i, content in enumerate(contents):
+        formatter.render(content, i)
+    warm = time.perf_counter() - started
+
+    return {
+        "messages": messages,
+        "cold_messages_per_sec": round(messages / cold, 1),
+        "cached_messages_per_sec": round(messages / warm, 1),
+    }
+
+def bench_vectors(workdir: str, rows: int, queries: int, seed: int) -> Dict:
+    """Append random vectors in batches, then time top-k searches and the local embedder."""
+    rng = random.Random(seed)
+    embedder = HashingEmbedder()
+    index = VectorIndex(os.path.join(workdir, f"vectors_{rows}"), embedder)
+    batch_size = 50000
+
+    # Random unit vectors cost the same to search as real ones and are far quicker to make
+    generator = np.random.default_rng(seed)
+    append_elapsed = 0.0
+    for start in range(0, rows, batch_size):
+        count = min(batch_size, rows - start)
+        vectors = generator.standard_normal((count, embedder.dim), dtype=np.float32)
+        started = time.perf_counter()
+        index.add_vectors(range(start + 1, start + count + 1), vectors)
+        append_elapsed += time.perf_counter() - started
+
+    texts = [random_text(rng, 60) for _ in range(1000)]
+    started = time.perf_counter()
+    embedder.embed(texts)
+    embed_elapsed = time.perf_counter() - started
+
+    samples = []
+    for _ in range(queries):
+        query = random_text(rng, 12)
+        started = time.perf_counter()
+        index.search(query, k=5)
+        samples.append(time.perf_counter() - started)
+    index.close()
+    return {
+        "rows": rows,
+        "append_rows_per_sec": round(rows / append_elapsed, 1),
+        "embed_messages_per_sec": round(len(texts) / embed_elapsed, 1),
+        "search": percentiles(samples),
+        "file_size_mb": round(os.path.getsize(index.path + ".f32") / 1e6, 2),
+    }
+
+IMPORT_PROBE = (
+    "import sys, time; started = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - started, 'PyQt6' in sys.modules, 'openai' in sys.modules)"
+)
+
+def bench_startup(workdir: str, runs: int) -> Dict:
+    """Time cold imports and window startup, each in a fresh interpreter."""
+    results = {}
+    for module in ("classes.MessageDatabase", "classes.ChatBot", "classes.ChatBotWindow"):
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+                cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout.split()
+            samples.append(float(out[0]))
+        results[f"import_{module.split('.')[-1]}"] = {
+            **percentiles(samples),
+            "loads_pyqt6": out[1] == "True",
+            "loads_openai": out[2] == "True",
+        }
+
+    # main.py prints its timings and quits once history is loaded
+    env = {**os.environ, "STARTUP_TIMING": "exit", "QT_QPA_PLATFORM": os.getenv("QT_QPA_PLATFORM", "offscreen")}
+    shown, ready = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "main.py")],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=120
+        ).stdout
+        timings = dict(line.split(": ") for line in out.splitlines() if line.startswith("startup_"))
+        shown.append(float(timings["startup_window_shown_seconds"].split()[0]) / 1000)
+        ready.append(float(timings["startup_ready_seconds"].split()[0]) / 1000)
+    results["window_shown"] = percentiles(shown)
+    results["window_ready"] = percentiles(ready)
+    return results
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(current: Dict, baseline_path: str) -> None:
+    """Print the relative change of every numeric result against an earlier run."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = flatten(json.load(f)["results"])
+    print(f"\nChange against {baseline_path}:")
+    for name, value in flatten(current["results"]).items():
+        # Only measurements; counts and settings are equal by construction
+        if not name.endswith(("_ms", "_per_sec", "_rps", "_mb")):
+            continue
+        before = baseline.get(name)
+        if before:
+            print(f"  {name}: {before:g} -> {value:g} ({(value - before) / before * 100:+.1f}%)")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ChatBot, MessageDatabase, the vector index, the formatter and startup")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma separated database sizes in rows")
+    parser.add_argument("--queries", type=int, default=200, help="Timed queries per database benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="Chat requests per API benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent chat requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server response latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Fake server delay between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--format-messages", type=int, default=5000, help="Messages rendered by the formatter benchmark")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Fresh interpreters per startup measurement")
+    parser.add_argument("--only", choices=["chat", "db", "format", "startup", "vectors"], action="append", help="Run only these benchmarks")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record peak Python allocations (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Results file (default benchmarks/results/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    selected = set(args.only or ["chat", "db", "format", "startup", "vectors"])
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": {},
+    }
+    results = report["results"]
+    workdir = tempfile.mkdtemp(prefix="llm_bench_")
+
+    try:
+        if "chat" in selected:
+            server = FakeOpenAIServer(args.latency, args.token_delay, args.error_rate, seed=args.seed).start()
+            try:
+                for stream in (False, True):
+                    name = "chat_stream" if stream else "chat"
+                    print(f"Running {name} ({args.requests} requests)...")
+                    results[name] = with_memory(
+                        lambda: bench_chat(server, workdir, args.requests, args.concurrency, stream),
+                        args.trace_memory
+                    )
+            finally:
+                server.stop()
+
+        if "db" in selected:
+            for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+                print(f"Running database with {size} rows...")
+                results[f"db_{size}"] = with_memory(
+                    lambda: bench_database(workdir, size, args.queries, args.seed), args.trace_memory
+                )
+
+        if "vectors" in selected:
+            for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+                print(f"Running vector index with {size} rows...")
+                results[f"vectors_{size}"] = with_memory(
+                    lambda: bench_vectors(workdir, size, min(args.queries, 50), args.seed), args.trace_memory
+                )
+
+        if "format" in selected:
+            print(f"Running formatter ({args.format_messages} messages)...")
+            results["formatter"] = with_memory(
+                lambda: bench_formatter(args.format_messages, args.seed), args.trace_memory
+            )
+
+        if "startup" in selected:
+            print(f"Running startup ({args.startup_runs} runs)...")
+            results["startup"] = bench_startup(workdir, args.startup_runs)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report["max_rss_mb"] = max_rss_mb()
+
+    output = args.output
+    if output is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{stamp}_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
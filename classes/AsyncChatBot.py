@@ -0,0 +1,249 @@
+import asyncio
+import os
+import textwrap
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+from .ChatBot import ChatBotConfig, build_context_builder, build_response_metadata, record_response_metrics
+from .Metrics import metrics
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+from .AsyncMessageDatabase import AsyncMessageDatabase
+
+class AsyncChatBot:
+    """Serves many conversations concurrently from a single event loop."""
+    def __init__(
+        self,
+        config: Optional[ChatBotConfig] = None,
+        max_concurrency: int = 64,
+        request_timeout: float = 60.0,
+        message_db: Optional[AsyncMessageDatabase] = None,
+        client: Optional["AsyncOpenAI"] = None
+    ):
+        """
+        Initialize the AsyncChatBot.
+
+        Args:
+            config: Optional ChatBotConfig instance for customization
+            max_concurrency: Maximum number of completion requests in flight
+            request_timeout: Seconds before a single completion request is abandoned
+            message_db: Optional async message store (a default one is created otherwise)
+            client: Optional AsyncOpenAI client to share with other bots
+        """
+        self.config = config or ChatBotConfig()
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+
+        if client is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise ValueError("OPENAI_API_KEY environment variable is not set.")
+            # One client means one HTTP connection pool shared by every conversation
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key, base_url=self.config.base_url)
+        self.client = client
+        self.message_db = message_db or AsyncMessageDatabase()
+        self.context_builder = build_context_builder(self.config)
+
+        self.conversations: Dict[int, List[Dict[str, str]]] = {}
+        self._conversation_locks: Dict[int, asyncio.Lock] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the loop that actually runs the bot
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _get_lock(self, conversation_id: int) -> asyncio.Lock:
+        if conversation_id not in self._conversation_locks:
+            self._conversation_locks[conversation_id] = asyncio.Lock()
+        return self._conversation_locks[conversation_id]
+
+    async def start_conversation(self, title: Optional[str] = None) -> int:
+        """
+        Create a new stored conversation.
+
+        Args:
+            title: Optional human readable title
+
+        Returns:
+            int: The new conversation ID
+        """
+        conversation_id = await self.message_db.create_conversation(title)
+        if conversation_id is None:
+            raise Exception("Error creating conversation")
+        self.conversations[conversation_id] = [{"role": "system", "content": self.config.system_message}]
+        return conversation_id
+
+    async def open_conversation(self, conversation_id: int) -> bool:
+        """
+        Load a stored conversation so it can be continued.
+
+        Args:
+            conversation_id: The ID of the conversation to open
+
+        Returns:
+            bool: True if the conversation exists, False otherwise
+        """
+        if await self.message_db.get_conversation(conversation_id) is None:
+            return False
+        rows = await self.message_db.get_messages_page(
+            limit=self.config.history_limit,
+            columns=["role", "content"],
+            conversation_id=conversation_id
+        )
+        messages = [{"role": "system", "content": self.config.system_message}]
+        messages.extend({"role": role, "content": content} for role, content in rows)
+        self.conversations[conversation_id] = messages
+        return True
+
+    async def _get_messages(self, conversation_id: int) -> List[Dict[str, str]]:
+        if conversation_id not in self.conversations and not await self.open_conversation(conversation_id):
+            raise ValueError(f"Unknown conversation: {conversation_id}")
+        return self.conversations[conversation_id]
+
+    async def chat(self, conversation_id: int, user_message: str) -> str:
+        """
+        Process a user message in one conversation and get the AI's response.
+
+        Turns within a conversation are serialized; different conversations
+        run concurrently up to max_concurrency requests.
+
+        Args:
+            conversation_id: The conversation to continue
+            user_message: The user's input message
+
+        Returns:
+            str: The AI's response
+
+        Raises:
+            Exception: If there's an error communicating with the API
+        """
+        async with self._get_lock(conversation_id):
+            messages = await self._get_messages(conversation_id)
+            await self._add_message(conversation_id, messages, "user", user_message)
+
+            try:
+                async with self._get_semaphore():
+                    started = time.perf_counter()
+                    response = await asyncio.wait_for(
+                        self.client.chat.completions.create(**self._completion_params(messages)),
+                        timeout=self.request_timeout
+                    )
+            except asyncio.TimeoutError:
+                metrics.increment("chat_errors_total")
+                raise Exception(f"Error in chat completion: request timed out after {self.request_timeout}s")
+            except Exception as e:
+                metrics.increment("chat_errors_total")
+                raise Exception(f"Error in chat completion: {str(e)}")
+
+            choice = response.choices[0]
+            metadata = build_response_metadata(
+                response.model or self.config.model,
+                response.usage,
+                choice.finish_reason,
+                time.perf_counter() - started
+            )
+            record_response_metrics(metadata)
+            return await self._add_message(conversation_id, messages, "assistant", choice.message.content, metadata)
+
+    async def chat_stream(self, conversation_id: int, user_message: str) -> AsyncIterator[str]:
+        """
+        Process a user message and stream the AI's response as it is generated.
+
+        Args:
+            conversation_id: The conversation to continue
+            user_message: The user's input message
+
+        Yields:
+            str: Content deltas of the AI's response
+
+        Raises:
+            Exception: If there's an error communicating with the API
+        """
+        async with self._get_lock(conversation_id):
+            messages = await self._get_messages(conversation_id)
+            await self._add_message(conversation_id, messages, "user", user_message)
+
+            parts = []
+            model = usage = finish_reason = first_token = None
+            async with self._get_semaphore():
+                started = time.perf_counter()
+                try:
+                    stream = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            **self._completion_params(messages),
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        ),
+                        timeout=self.request_timeout
+                    )
+                except asyncio.TimeoutError:
+                    metrics.increment("chat_errors_total")
+                    raise Exception(f"Error in chat completion: request timed out after {self.request_timeout}s")
+                except Exception as e:
+                    metrics.increment("chat_errors_total")
+                    raise Exception(f"Error in chat completion: {str(e)}")
+
+                try:
+                    async for chunk in stream:
+                        model = chunk.model or model
+                        usage = chunk.usage or usage
+                        if not chunk.choices:
+                            continue
+                        choice = chunk.choices[0]
+                        finish_reason = choice.finish_reason or finish_reason
+                        delta = choice.delta.content
+                        if delta:
+                            if first_token is None:
+                                first_token = time.perf_counter() - started
+                            parts.append(delta)
+                            yield delta
+                except Exception as e:
+                    metrics.increment("chat_errors_total")
+                    raise Exception(f"Error in chat completion: {str(e)}")
+                finally:
+                    await stream.close()
+
+            metadata = build_response_metadata(
+                model or self.config.model, usage, finish_reason, time.perf_counter() - started, first_token
+            )
+            record_response_metrics(metadata)
+            await self._add_message(conversation_id, messages, "assistant", "".join(parts), metadata)
+
+    async def _add_message(
+        self,
+        conversation_id: int,
+        messages: List[Dict[str, str]],
+        role: str,
+        content: str,
+        metadata: Optional[Dict] = None
+    ) -> str:
+        """Append a message to a conversation and store it."""
+        if role == "assistant" and "```" in content:
+            content = textwrap.dedent(content)
+        messages.append({"role": role, "content": content})
+        await self.message_db.add_message(
+            role=role,
+            content=content,
+            metadata=metadata,
+            conversation_id=conversation_id
+        )
+        return content
+
+    def _completion_params(self, messages: List[Dict[str, str]]) -> Dict:
+        """Build the chat completion request parameters from the config."""
+        return {
+            "model": self.config.model,
+            "messages": self.context_builder.build(messages) if self.context_builder else list(messages),
+            "temperature": self.config.temperature,
+            "max_tokens": self.config.max_tokens,
+            "presence_penalty": self.config.presence_penalty,
+            "frequency_penalty": self.config.frequency_penalty
+        }
+
+    async def close(self) -> None:
+        """Close the HTTP connection pool and the message store."""
+        await self.client.close()
+        await self.message_db.close()
@@ -0,0 +1,70 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from .MessageDatabase import MessageDatabase
+
+class AsyncMessageDatabase:
+    """Awaitable facade over MessageDatabase that keeps SQLite off the event loop."""
+    def __init__(self, message_db: Optional[MessageDatabase] = None, max_workers: int = 2):
+        """
+        Initialize the async message store.
+
+        Args:
+            message_db: Optional MessageDatabase to wrap (a default one is created otherwise)
+            max_workers: Number of threads running database calls
+        """
+        self.message_db = message_db or MessageDatabase()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AsyncMessageDatabase")
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking database call on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def add_message(
+        self,
+        role: str,
+        content: str,
+        username: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        conversation_id: Optional[int] = None,
+        uid: Optional[str] = None
+    ) -> bool:
+        return await self._run(
+            self.message_db.add_message,
+            role, content,
+            username=username,
+            metadata=metadata,
+            conversation_id=conversation_id,
+            uid=uid
+        )
+
+    async def add_messages(self, messages: List[Dict]) -> bool:
+        return await self._run(self.message_db.add_messages, messages)
+
+    async def get_messages(self, **kwargs) -> List[Tuple]:
+        return await self._run(self.message_db.get_messages, **kwargs)
+
+    async def get_messages_page(self, **kwargs) -> List[Tuple]:
+        return await self._run(self.message_db.get_messages_page, **kwargs)
+
+    async def create_conversation(self, title: Optional[str] = None) -> Optional[int]:
+        return await self._run(self.message_db.create_conversation, title)
+
+    async def get_conversation(self, conversation_id: int) -> Optional[Tuple]:
+        return await self._run(self.message_db.get_conversation, conversation_id)
+
+    async def list_conversations(self, limit: Optional[int] = None) -> List[Tuple]:
+        return await self._run(self.message_db.list_conversations, limit)
+
+    async def delete_conversation(self, conversation_id: int) -> bool:
+        return await self._run(self.message_db.delete_conversation, conversation_id)
+
+    async def search(self, query: str, limit: int = 20, conversation: Optional[int] = None) -> List[Tuple]:
+        return await self._run(self.message_db.search, query, limit, conversation)
+
+    async def close(self) -> None:
+        """Flush pending writes, close the database and stop the executor."""
+        await self._run(self.message_db.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, Optional, Set
+from .ChatBot import ChatBot, ChatBotConfig, create_client
+from .MessageDatabase import MessageDatabase, DatabaseConfig
+from .RequestScheduler import RequestScheduler
+from .ResponseCache import ResponseCache
+
+class BatchRunner:
+    """Runs prompts from a JSONL or CSV file through ChatBot with a worker pool."""
+    def __init__(
+        self,
+        config: Optional[ChatBotConfig] = None,
+        parallelism: int = 4,
+        db_path: str = 'llmdb.db'
+    ):
+        """
+        Initialize the batch runner.
+
+        Args:
+            config: Optional ChatBotConfig used for every prompt
+            parallelism: Number of prompts processed concurrently
+            db_path: Database the batch conversations are stored in
+        """
+        self.config = config or ChatBotConfig()
+        self.parallelism = max(parallelism, 1)
+        # Shared by every worker: one HTTP pool, one rate limiter, one write-behind queue
+        self.client = create_client(self.config)
+        self.scheduler = RequestScheduler(
+            requests_per_minute=self.config.requests_per_minute,
+            tokens_per_minute=self.config.tokens_per_minute,
+            max_retries=self.config.max_retries
+        )
+        self.message_db = MessageDatabase(db_path, DatabaseConfig(write_batch_size=64))
+        # Opened once here rather than by every prompt's ChatBot
+        self.response_cache = None
+        if self.config.cache_responses:
+            self.response_cache = ResponseCache(db_path, ttl_seconds=self.config.cache_ttl)
+        self.vector_index = None
+        if self.config.retrieval_top_k:
+            # Imported here: NumPy is only needed when retrieval is enabled
+            from .VectorIndex import VectorIndex
+            self.vector_index = VectorIndex(f"{db_path}.vectors")
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def read_prompts(input_path: str) -> Iterator[Dict]:
+        """
+        Stream prompt records from a JSONL or CSV file.
+
+        Each record needs a "prompt" field and may carry an "id"; records
+        without one are numbered by their position in the file.
+
+        Args:
+            input_path: Path to a .jsonl or .csv file
+
+        Yields:
+            dict: Records with at least "id" and "prompt"
+        """
+        with open(input_path, 'r', encoding='utf-8', newline='') as f:
+            if input_path.lower().endswith(".csv"):
+                rows = csv.DictReader(f)
+            else:
+                rows = (json.loads(line) for line in f if line.strip())
+            for index, row in enumerate(rows, start=1):
+                if not row.get("prompt"):
+                    continue
+                row["id"] = str(row.get("id") or index)
+                yield row
+
+    @staticmethod
+    def completed_ids(output_path: str) -> Set[str]:
+        """
+        Read the IDs that already have a successful result.
+
+        Args:
+            output_path: Path to the results JSONL file
+
+        Returns:
+            Set of completed prompt IDs
+        """
+        done = set()
+        if not os.path.exists(output_path):
+            return done
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a truncated last line; that prompt is simply rerun
+                    continue
+                if record.get("error") is None:
+                    done.add(str(record["id"]))
+        return done
+
+    def run_one(self, record: Dict) -> Dict:
+        """
+        Send a single prompt in its own conversation.
+
+        Args:
+            record: A prompt record from read_prompts
+
+        Returns:
+            dict: The result record written to the output file
+        """
+        config = self.config
+        if record.get("system"):
+            config = ChatBotConfig(**{**vars(self.config), "system_message": record["system"]})
+
+        chatbot = ChatBot(
+            config,
+            scheduler=self.scheduler,
+            client=self.client,
+            message_db=self.message_db,
+            vector_index=self.vector_index,
+            response_cache=self.response_cache
+        )
+        started = time.perf_counter()
+        result = {"id": record["id"], "prompt": record["prompt"], "response": None, "error": None}
+        try:
+            result["response"] = chatbot.chat(record["prompt"])
+            result["conversation_id"] = chatbot.conversation_id
+        except Exception as e:
+            result["error"] = str(e)
+        finally:
+            chatbot.close()
+        result["latency"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def run(self, input_path: str, output_path: str, resume: bool = True) -> Dict[str, int]:
+        """
+        Process every pending prompt and append results to output_path.
+
+        The output file doubles as the checkpoint: each result is flushed as
+        soon as it completes, and with resume enabled prompts that already
+        have a successful result are skipped.
+
+        Args:
+            input_path: Path to a .jsonl or .csv prompt file
+            output_path: Path to the results JSONL file
+            resume: Skip prompts completed by a previous run
+
+        Returns:
+            dict: Counts of completed, failed and skipped prompts
+        """
+        done = self.completed_ids(output_path) if resume else set()
+        stats = {"completed": 0, "failed": 0, "skipped": 0}
+        mode = 'a' if resume else 'w'
+
+        with open(output_path, mode, encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="BatchRunner") as executor:
+            pending = set()
+            for record in self.read_prompts(input_path):
+                if record["id"] in done:
+                    stats["skipped"] += 1
+                    continue
+                # Keep a bounded window of work so memory stays flat on huge inputs
+                if len(pending) >= self.parallelism * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._write_results(out, finished, stats)
+                pending.add(executor.submit(self.run_one, record))
+
+            finished, _ = wait(pending)
+            self._write_results(out, finished, stats)
+
+        self.message_db.flush()
+        return stats
+
+    def _write_results(self, out, futures, stats: Dict[str, int]) -> None:
+        """Append finished results to the output file and flush them to disk."""
+        with self._write_lock:
+            for future in futures:
+                result = future.result()
+                stats["failed" if result["error"] else "completed"] += 1
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+    def close(self) -> None:
+        """Flush stored messages and close the database, cache and index."""
+        if self.vector_index is not None:
+            self.vector_index.close()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        self.message_db.close()
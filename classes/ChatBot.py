@@ -1,9 +1,21 @@
-from openai import OpenAI
 import os
 import textwrap
 import json
-from typing import List, Dict, Optional, Union
-from .MessageDatabase import MessageDatabase
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, List, Dict, Iterator, Optional, Set, Union
+from .MessageDatabase import MessageDatabase, DatabaseConfig
+from .ContextBuilder import ContextBuilder, TokenCounter, summary_message
+from .ConversationSummarizer import ConversationSummarizer, build_summary_messages
+from .ResponseCache import ResponseCache
+from .RequestScheduler import RequestScheduler
+from .ChatExporter import EXPORT_SUFFIXES, read_records, write_records
+from .Metrics import metrics
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+    from .VectorIndex import VectorIndex
 
 class ChatBotConfig:
     """Configuration class for ChatBot settings."""
@@ -14,6 +26,20 @@ class ChatBotConfig:
         max_tokens: Optional[int] = None,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        base_url: Optional[str] = None,
+        max_context_tokens: Optional[int] = 12000,
+        history_limit: int = 500,
+        cache_responses: bool = False,
+        cache_ttl: Optional[float] = 86400,
+        max_retries: int = 5,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        summarize_every: Optional[int] = None,
+        summary_keep_recent: int = 6,
+        summary_model: Optional[str] = None,
+        retrieval_top_k: int = 0,
+        retrieval_min_score: float = 0.3,
+        retrieval_snippet_chars: int = 1500,
         system_message: str = (
             "I'm a coding assistant specialized in generating code using Markdown format. "
             "I can help with any coding-related questions or tasks. "
@@ -25,101 +51,697 @@ class ChatBotConfig:
         self.max_tokens = max_tokens
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
+        # Point the client at an OpenAI-compatible server, e.g. a local fake for tests
+        self.base_url = base_url
+        # Prompt token budget per request; None sends the full history
+        self.max_context_tokens = max_context_tokens
+        # Number of stored messages loaded when a conversation is reopened
+        self.history_limit = history_limit
+        # Reuse stored responses for identical requests (opt-in)
+        self.cache_responses = cache_responses
+        self.cache_ttl = cache_ttl
+        # Retry and rate limit settings for the request scheduler
+        self.max_retries = max_retries
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Fold older turns into a stored rolling summary every N turns; None sends them verbatim
+        self.summarize_every = summarize_every
+        # Messages always sent verbatim after the summary
+        self.summary_keep_recent = summary_keep_recent
+        # Model that writes summaries; None uses the chat model
+        self.summary_model = summary_model
+        # Add up to this many related answers from other conversations to each request; 0 disables
+        self.retrieval_top_k = retrieval_top_k
+        # Minimum cosine similarity for an answer to count as related
+        self.retrieval_min_score = retrieval_min_score
+        # Longer answers are cut to this many characters
+        self.retrieval_snippet_chars = retrieval_snippet_chars
         self.system_message = system_message
 
+def build_context_builder(config: ChatBotConfig, token_counter: Optional[TokenCounter] = None) -> Optional[ContextBuilder]:
+    """Create the context builder for a config, or None when trimming is disabled."""
+    if not config.max_context_tokens:
+        return None
+    return ContextBuilder(config.max_context_tokens, token_counter or TokenCounter(config.model))
+
+def build_response_metadata(
+    model: str,
+    usage,
+    finish_reason: Optional[str],
+    latency: float,
+    time_to_first_token: Optional[float] = None
+) -> Dict:
+    """Build the metadata stored with an assistant response from the API's usage and timings."""
+    metadata = {
+        "model": model,
+        "finish_reason": finish_reason,
+        "latency_ms": round(latency * 1000, 1),
+    }
+    if time_to_first_token is not None:
+        metadata["ttft_ms"] = round(time_to_first_token * 1000, 1)
+    if usage is not None:
+        metadata["prompt_tokens"] = usage.prompt_tokens
+        metadata["completion_tokens"] = usage.completion_tokens
+        metadata["total_tokens"] = usage.total_tokens
+    return metadata
+
+def record_response_metrics(metadata: Dict) -> None:
+    """Feed an assistant response's metadata into the process metrics."""
+    metrics.increment("chat_responses_total")
+    if metadata.get("cached"):
+        metrics.increment("chat_cache_hits_total")
+        return
+    metrics.observe("chat_request_seconds", metadata["latency_ms"] / 1000)
+    if "ttft_ms" in metadata:
+        metrics.observe("chat_ttft_seconds", metadata["ttft_ms"] / 1000)
+    metrics.increment("chat_prompt_tokens_total", metadata.get("prompt_tokens") or 0)
+    metrics.increment("chat_completion_tokens_total", metadata.get("completion_tokens") or 0)
+
+def create_client(config: ChatBotConfig) -> "OpenAI":
+    """Create an OpenAI client for a config; retries are left to the RequestScheduler."""
+    # The SDK takes most of a second to import, so it is only loaded when a client is needed
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=config.base_url, max_retries=0)
+
+def related_message(snippets: List[str], max_chars: int) -> Dict[str, str]:
+    """Wrap related earlier answers in the system message sent with a request."""
+    parts = [
+        snippet if len(snippet) <= max_chars else snippet[:max_chars] + "..."
+        for snippet in snippets
+    ]
+    return {
+        "role": "system",
+        "content": "Related answers from earlier conversations:\n\n" + "\n\n---\n\n".join(parts)
+    }
+
 class ChatBot:
-    def __init__(self, config: Optional[ChatBotConfig] = None):
+    def __init__(
+        self,
+        config: Optional[ChatBotConfig] = None,
+        conversation_id: Optional[int] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        client: Optional["OpenAI"] = None,
+        message_db: Optional[MessageDatabase] = None,
+        summarizer: Optional[Callable[[Optional[str], List[Dict[str, str]]], str]] = None,
+        vector_index: Optional["VectorIndex"] = None,
+        response_cache: Optional[ResponseCache] = None
+    ):
         """
         Initialize the ChatBot with optional configuration.
         
         Args:
             config: Optional ChatBotConfig instance for customization
+            conversation_id: Optional stored conversation to continue
+            scheduler: Optional RequestScheduler shared with other ChatBots
+            client: Optional OpenAI client shared with other ChatBots
+            message_db: Optional MessageDatabase shared with other ChatBots
+            summarizer: Optional callable used instead of the chat model to
+                fold turns into the summary, given the current summary and the
+                messages to add (requires config.summarize_every)
+            vector_index: Optional VectorIndex searched for related answers
+                (requires config.retrieval_top_k); defaults to one stored
+                next to the database with the local HashingEmbedder
+            response_cache: Optional ResponseCache shared with other ChatBots
+                (requires config.cache_responses)
         """
         self.config = config or ChatBotConfig()
         self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        if client is None and not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set.")
         
-        self.client = OpenAI(api_key=self.api_key)
+        # Created on first request; retries are handled by the scheduler so it can honour rate limits
+        self._client = client
+        self.scheduler = scheduler or RequestScheduler(
+            requests_per_minute=self.config.requests_per_minute,
+            tokens_per_minute=self.config.tokens_per_minute,
+            max_retries=self.config.max_retries
+        )
         self.messages: List[Dict[str, str]] = []
-        self.message_db = MessageDatabase()
+        # Guards self.messages when several requests are in flight
+        self._lock = threading.RLock()
+        # Turns run one at a time in ticket order, so each request sees the previous answer
+        self._turns = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._running_ticket: Optional[int] = None
+        # Tickets cancelled before their turn came; skipped when it does
+        self._dropped_tickets: Set[int] = set()
+        self._closed = False
+        self.token_counter = TokenCounter(self.config.model)
+        self.context_builder = build_context_builder(self.config, self.token_counter)
+        # A shared database is closed by its owner, not by this ChatBot
+        self._owns_db = message_db is None
+        # Messages are written behind the request path so disk stalls never add latency
+        self.message_db = message_db or MessageDatabase(config=DatabaseConfig(write_batch_size=64))
+        self.response_cache = None
+        self._owns_cache = response_cache is None
+        if self.config.cache_responses:
+            self.response_cache = response_cache
+            if response_cache is None:
+                self.response_cache = ResponseCache(self.message_db.db_path, ttl_seconds=self.config.cache_ttl)
+        self.conversation_id: Optional[int] = None
+        
+        # Rolling summary of the oldest turns; only the turns after it are sent
+        self.summary: Optional[str] = None
+        # Number of leading non-system messages covered by the summary
+        self.summarized = 0
+        # Stored messages of the conversation older than the first one in self.messages
+        self._history_offset = 0
+        # Bumped whenever the history is replaced, so stale summaries are discarded
+        self._history_generation = 0
+        self.summarizer = None
+        if self.config.summarize_every:
+            self.summarizer = ConversationSummarizer(
+                summarizer or self.summarize_messages,
+                every_turns=self.config.summarize_every,
+                keep_recent=self.config.summary_keep_recent
+            )
+        
+        self.vector_index = None
+        self._owns_index = vector_index is None
+        if self.config.retrieval_top_k:
+            # Not `or`: an empty index is falsy
+            self.vector_index = vector_index if vector_index is not None else self._open_vector_index()
+            # Index whatever is not indexed yet without holding up requests
+            self.vector_index.sync_in_background(self.message_db)
         
         # Initialize with system message
         self.add_system_message(self.config.system_message)
+        
+        if conversation_id is not None:
+            self.open_conversation(conversation_id)
+    
+    @property
+    def client(self) -> "OpenAI":
+        """The OpenAI client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = create_client(self.config)
+        return self._client
+    
+    def _open_vector_index(self) -> "VectorIndex":
+        """Open the default index stored next to the message database."""
+        # Imported here: NumPy is only needed when retrieval is enabled
+        from .VectorIndex import VectorIndex
+        return VectorIndex(f"{self.message_db.db_path}.vectors")
     
     def add_system_message(self, message: str) -> None:
         """Add a system message to the conversation."""
-        self.messages.append({"role": "system", "content": message})
+        with self._lock:
+            self.messages.append({"role": "system", "content": message})
     
-    def chat(self, user_message: str) -> str:
+    def chat(
+        self,
+        user_message: str,
+        conversation_id: Optional[int] = None,
+        ticket: Optional[int] = None
+    ) -> str:
         """
         Process a user message and get a response from the AI.
         
+        Turns run one at a time in the order their tickets were reserved,
+        so every request sees the previous answer and questions and
+        answers are stored in order.
+        
         Args:
             user_message: The user's input message
+            conversation_id: Optional conversation the turn belongs to; the
+                answer is stored there even if the ChatBot switches meanwhile
+            ticket: Optional place in the turn queue from reserve_turn();
+                one is taken when the call starts otherwise
         
         Returns:
             str: The AI's response
         
         Raises:
-            Exception: If there's an error communicating with the API
+            Exception: If there's an error communicating with the API or
+                the ticket was cancelled before the turn started
         """
+        with self._take_turn(ticket) as run:
+            if not run:
+                raise Exception("The request was cancelled before it was sent")
+            return self._chat_turn(user_message, conversation_id)
+    
+    def _chat_turn(self, user_message: str, conversation_id: Optional[int]) -> str:
         try:
             # Add user message
-            self.add_user_message(user_message)
+            conversation_id = self._begin_turn(user_message, conversation_id)
             
-            # Create chat completion
-            response = self.client.chat.completions.create(
-                model=self.config.model,
-                messages=self.messages,
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens,
-                presence_penalty=self.config.presence_penalty,
-                frequency_penalty=self.config.frequency_penalty
-            )
+            params = self._completion_params(query=user_message)
+            cache_key = self._cache_key(params)
+            assistant_message = self.response_cache.get(cache_key) if cache_key else None
+            
+            if assistant_message is None:
+                # Create chat completion
+                started = time.perf_counter()
+                response = self._create_completion(params)
+                choice = response.choices[0]
+                assistant_message = choice.message.content
+                metadata = build_response_metadata(
+                    getattr(response, "model", None) or self.config.model,
+                    getattr(response, "usage", None),
+                    choice.finish_reason,
+                    time.perf_counter() - started
+                )
+                if cache_key:
+                    self.response_cache.set(cache_key, assistant_message)
+            else:
+                metadata = {"model": self.config.model, "cached": True}
             
             # Process and store response
-            assistant_message = response.choices[0].message.content
-            self.add_assistant_message(assistant_message)
+            record_response_metrics(metadata)
+            self.add_assistant_message(assistant_message, metadata, conversation_id=conversation_id)
             
             return assistant_message
             
         except Exception as e:
+            metrics.increment("chat_errors_total")
             error_msg = f"Error in chat completion: {str(e)}"
             print(error_msg)
             raise Exception(error_msg)
     
-    def add_user_message(self, message: str) -> None:
+    def chat_stream(
+        self,
+        user_message: str,
+        conversation_id: Optional[int] = None,
+        ticket: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Process a user message and stream the AI's response as it is generated.
+        
+        The complete response is added to the history and stored once the
+        stream has finished. Turns are ordered as in chat(); close the
+        iterator to give up a turn early. A ticket cancelled before its
+        turn yields nothing.
+        
+        Args:
+            user_message: The user's input message
+            conversation_id: Optional conversation the turn belongs to; the
+                answer is stored there even if the ChatBot switches meanwhile
+            ticket: Optional place in the turn queue from reserve_turn()
+        
+        Yields:
+            str: Content deltas of the AI's response
+        
+        Raises:
+            Exception: If there's an error communicating with the API
+        """
+        with self._take_turn(ticket) as run:
+            if run:
+                yield from self._stream_turn(user_message, conversation_id)
+    
+    def reserve_turn(self) -> int:
+        """
+        Take the next place in the turn queue.
+        
+        Reserve it where messages are sent (e.g. the UI thread) so turns run
+        in send order however the worker threads are scheduled. Every ticket
+        must be passed to chat()/chat_stream() or to cancel_turn().
+        
+        Returns:
+            int: The ticket
+        """
+        with self._turns:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            return ticket
+    
+    def cancel_turn(self, ticket: int) -> None:
+        """
+        Drop a turn that has not started, so it never sends its request.
+        
+        A turn already running is not affected; stop iterating its stream
+        instead.
+        
+        Args:
+            ticket: A ticket from reserve_turn()
+        """
+        with self._turns:
+            if ticket < self._serving or ticket == self._running_ticket:
+                return
+            self._dropped_tickets.add(ticket)
+            self._advance_turns()
+    
+    def _advance_turns(self) -> None:
+        """Skip dropped tickets at the head of the queue; call with _turns held."""
+        while self._serving in self._dropped_tickets:
+            self._dropped_tickets.discard(self._serving)
+            self._serving += 1
+        self._turns.notify_all()
+    
+    @contextmanager
+    def _take_turn(self, ticket: Optional[int]) -> Iterator[bool]:
+        """Wait for a ticket's turn; yields False if it was cancelled meanwhile."""
+        if ticket is None:
+            ticket = self.reserve_turn()
+        with self._turns:
+            self._turns.wait_for(lambda: self._serving >= ticket or ticket in self._dropped_tickets)
+            run = self._serving == ticket
+            if run:
+                self._running_ticket = ticket
+        if not run:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._turns:
+                self._running_ticket = None
+                self._serving += 1
+                self._advance_turns()
+    
+    def _stream_turn(self, user_message: str, conversation_id: Optional[int]) -> Iterator[str]:
+        conversation_id = self._begin_turn(user_message, conversation_id)
+        
+        params = self._completion_params(query=user_message)
+        cache_key = self._cache_key(params)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            yield cached
+            metadata = {"model": self.config.model, "cached": True}
+            record_response_metrics(metadata)
+            self.add_assistant_message(cached, metadata, conversation_id=conversation_id)
+            return
+        
+        parts = []
+        stream = None
+        model = usage = finish_reason = first_token = None
+        started = time.perf_counter()
+        try:
+            stream = self._create_completion(params, stream=True)
+            for chunk in stream:
+                model = getattr(chunk, "model", None) or model
+                # With include_usage the final chunk carries usage and no choices
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta.content
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            metrics.increment("chat_errors_total")
+            error_msg = f"Error in chat completion: {str(e)}"
+            print(error_msg)
+            raise Exception(error_msg)
+        finally:
+            # Release the HTTP connection even if the caller stops iterating early
+            if stream is not None:
+                stream.close()
+        
+        if cache_key:
+            self.response_cache.set(cache_key, "".join(parts))
+        metadata = build_response_metadata(
+            model or self.config.model, usage, finish_reason, time.perf_counter() - started, first_token
+        )
+        record_response_metrics(metadata)
+        self.add_assistant_message("".join(parts), metadata, conversation_id=conversation_id)
+    
+    def _begin_turn(self, user_message: str, conversation_id: Optional[int]) -> Optional[int]:
+        """Add the user message and return the conversation the turn belongs to."""
+        with self._lock:
+            if conversation_id is not None and conversation_id != self.conversation_id:
+                # The request was queued before a switch; its context is gone
+                raise Exception("The conversation was switched before the request was sent")
+        self.add_user_message(user_message)
+        return self.ensure_conversation()
+    
+    def _create_completion(self, params: Dict, stream: bool = False):
+        """Send a completion request through the scheduler."""
+        tokens = self.token_counter.count_messages(params["messages"]) + (self.config.max_tokens or 0)
+        if stream:
+            # Ask for token usage in the final chunk of the stream
+            params = {**params, "stream_options": {"include_usage": True}}
+        return self.scheduler.execute(
+            key=self.conversation_id,
+            func=lambda: self.client.chat.completions.create(**params, stream=stream),
+            tokens=tokens
+        )
+    
+    def _cache_key(self, params: Dict) -> Optional[str]:
+        """Return the response cache key for a request, or None when caching is off."""
+        if self.response_cache is None:
+            return None
+        return ResponseCache.make_key(params)
+    
+    def _completion_params(self, query: Optional[str] = None) -> Dict:
+        """
+        Build the chat completion request parameters from the config.
+        
+        Args:
+            query: Optional user message to look up related earlier answers for
+        """
+        messages = self.get_context()
+        related = self.find_related(query) if query and self.vector_index is not None else []
+        message = self._fit_related(messages, related) if related else None
+        if message is not None:
+            # Right before the question, so the latest turn stays last
+            messages.insert(len(messages) - 1, message)
+        return {
+            "model": self.config.model,
+            "messages": messages,
+            "temperature": self.config.temperature,
+            "max_tokens": self.config.max_tokens,
+            "presence_penalty": self.config.presence_penalty,
+            "frequency_penalty": self.config.frequency_penalty
+        }
+    
+    def _fit_related(self, messages: List[Dict[str, str]], related: List[str]) -> Optional[Dict[str, str]]:
+        """
+        Build the related answers message from as many snippets as the token budget leaves room for.
+        
+        The history is trimmed first, so the least similar snippets are the
+        first to go; None if not even the best one fits.
+        """
+        if self.context_builder is None:
+            return related_message(related, self.config.retrieval_snippet_chars)
+        budget = self.context_builder.max_tokens - self.token_counter.count_messages(messages)
+        for count in range(len(related), 0, -1):
+            message = related_message(related[:count], self.config.retrieval_snippet_chars)
+            if self.token_counter.count_message(message) <= budget:
+                return message
+        return None
+    
+    def find_related(self, query: str) -> List[str]:
+        """
+        Find earlier answers related to a query in other conversations.
+        
+        Only answers already indexed are searched; new ones are indexed in
+        the background after they are stored.
+        
+        Args:
+            query: The text to search for
+        
+        Returns:
+            List of answer texts, most similar first
+        """
+        top_k = self.config.retrieval_top_k
+        try:
+            with metrics.timer("retrieval_seconds"):
+                # Fetch extra: matches from this conversation are already in the context
+                hits = self.vector_index.search(query, k=top_k * 2)
+                hits = [message_id for message_id, score in hits if score >= self.config.retrieval_min_score]
+                rows = self.message_db.get_messages_by_ids(hits, columns=["conversation_id", "content"])
+        except Exception as e:
+            print(f"Error retrieving related messages: {e}")
+            return []
+        
+        related = [content for conversation_id, content in rows if conversation_id != self.conversation_id]
+        metrics.increment("retrieval_snippets_total", len(related[:top_k]))
+        return related[:top_k]
+    
+    def get_context(self) -> List[Dict[str, str]]:
+        """
+        Get the messages to send with the next request, trimmed to the token budget.
+        
+        Returns:
+            List of message dictionaries
+        """
+        with self._lock:
+            history = list(self.messages)
+            if self.summary is not None:
+                system = [message for message in history if message["role"] == "system"]
+                turns = [message for message in history if message["role"] != "system"]
+                history = system + [summary_message(self.summary)] + turns[self.summarized:]
+        if self.context_builder is None:
+            return history
+        return self.context_builder.build(history)
+    
+    def add_user_message(self, message: str, uid: Optional[str] = None) -> None:
         """
         Add a user message to the conversation history.
         
         Args:
             message: The user's message
+            uid: Optional unique message ID; storing the same uid again is a no-op
         """
-        self.messages.append({"role": "user", "content": message})
+        with self._lock:
+            self.messages.append({"role": "user", "content": message})
         self.message_db.add_message(
             role="user",
             content=message,
-            metadata={"timestamp": "user_message"}
+            metadata={"model": self.config.model},
+            conversation_id=self.ensure_conversation(title=message),
+            uid=uid
         )
     
-    def add_assistant_message(self, response: str) -> None:
+    def add_assistant_message(
+        self,
+        response: str,
+        metadata: Optional[Dict] = None,
+        uid: Optional[str] = None,
+        conversation_id: Optional[int] = None
+    ) -> None:
         """
         Add an assistant message to the conversation history.
         
         Args:
             response: The assistant's response
+            metadata: Optional response stats (model, token usage, latency)
+            uid: Optional unique message ID; storing the same uid again is a no-op
+            conversation_id: Optional conversation to store the message in; if it
+                is no longer the current one, the history is left alone
         """
         # Format code blocks if present
         if "```" in response:
             response = textwrap.dedent(response)
         
-        self.messages.append({"role": "assistant", "content": response})
+        with self._lock:
+            current = conversation_id is None or conversation_id == self.conversation_id
+            if current:
+                self.messages.append({"role": "assistant", "content": response})
         self.message_db.add_message(
             role="assistant",
             content=response,
-            metadata={"timestamp": "assistant_response"}
+            metadata=metadata or {"model": self.config.model},
+            conversation_id=conversation_id if conversation_id is not None else self.ensure_conversation(),
+            uid=uid
+        )
+        if current:
+            self.compact_history()
+        if self.vector_index is not None:
+            self.vector_index.sync_in_background(self.message_db)
+    
+    def compact_history(self) -> bool:
+        """
+        Fold the oldest unsummarized turns into the summary in the background, if due.
+        
+        Called for each new answer, so at most one summary request is made
+        per turn: a reopened long conversation catches up a batch per turn
+        rather than in a burst of requests nobody asked for.
+        
+        Returns:
+            bool: True if a compaction was started
+        """
+        if self.summarizer is None:
+            return False
+        with self._lock:
+            turns = [message for message in self.messages if message["role"] != "system"]
+            start = self.summarized
+            end = self.summarizer.next_batch(start, len(turns))
+            if end is None:
+                return False
+            summary = self.summary
+            generation = self._history_generation
+            conversation_id = self.conversation_id
+        
+        def apply(updated: str) -> None:
+            with self._lock:
+                # The history was cleared or replaced while the summary was written
+                if generation != self._history_generation or self.summarized != start:
+                    return
+                self.summary = updated
+                self.summarized = end
+                message_count = self._history_offset + end
+                if self._closed:
+                    return
+            if conversation_id is not None:
+                self.message_db.save_summary(conversation_id, updated, message_count)
+        
+        return self.summarizer.start(summary, turns[start:end], apply)
+    
+    def summarize_messages(self, summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """
+        Fold messages into a summary with the chat model; the default summarizer.
+        
+        Args:
+            summary: The current summary, or None
+            messages: The messages to fold in, oldest first
+        
+        Returns:
+            str: The updated summary
+        """
+        request = build_summary_messages(summary, messages)
+        params = {
+            "model": self.config.summary_model or self.config.model,
+            "messages": request,
+            "temperature": 0.2
+        }
+        response = self.scheduler.execute(
+            key=self.conversation_id,
+            func=lambda: self.client.chat.completions.create(**params),
+            tokens=self.token_counter.count_messages(request)
+        )
+        return response.choices[0].message.content
+    
+    def ensure_conversation(self, title: Optional[str] = None) -> Optional[int]:
+        """
+        Return the current conversation ID, creating the conversation on first use.
+        
+        Args:
+            title: Optional title for a newly created conversation
+        
+        Returns:
+            The conversation ID, or None if it could not be created
+        """
+        with self._lock:
+            if self.conversation_id is None:
+                self.conversation_id = self.message_db.create_conversation(
+                    title=title[:60].strip() if title else None
+                )
+            return self.conversation_id
+    
+    def new_conversation(self) -> None:
+        """Start a fresh conversation, keeping only the system message."""
+        self.clear_conversation()
+        self.conversation_id = None
+    
+    def open_conversation(self, conversation_id: int) -> bool:
+        """
+        Continue a stored conversation, loading its messages into the history.
+        
+        Args:
+            conversation_id: The ID of the conversation to open
+        
+        Returns:
+            bool: True if the conversation exists, False otherwise
+        """
+        if self.message_db.get_conversation(conversation_id) is None:
+            return False
+        
+        self.clear_conversation()
+        self.conversation_id = conversation_id
+        # Only the most recent turns can fit in a request, so older ones stay on disk
+        rows = self.message_db.get_messages_page(
+            limit=self.config.history_limit,
+            columns=["id", "role", "content"],
+            conversation_id=conversation_id
         )
+        # Turns folded into the stored summary are sent as the summary only
+        stored = self.message_db.get_summary(conversation_id)
+        if stored is not None:
+            rows = [row for row in rows if row[0] > stored[1]]
+        total = self.message_db.get_message_count(conversation_id=conversation_id)
+        with self._lock:
+            self.messages.extend({"role": role, "content": content} for _, role, content in rows)
+            self.summary = stored[0] if stored is not None else None
+            self._history_offset = max(total - len(rows), 0)
+        return True
     
     def get_conversation_history(self, limit: Optional[int] = None) -> List[Dict[str, str]]:
         """
@@ -131,28 +753,62 @@ class ChatBot:
         Returns:
             List of message dictionaries
         """
-        return self.messages[-limit:] if limit else self.messages
+        with self._lock:
+            return self.messages[-limit:] if limit else list(self.messages)
     
     def clear_conversation(self) -> None:
         """Clear the conversation history, keeping only the system message."""
-        system_message = next((msg for msg in self.messages if msg["role"] == "system"), None)
-        self.messages.clear()
-        if system_message:
-            self.messages.append(system_message)
+        with self._lock:
+            system_message = next((msg for msg in self.messages if msg["role"] == "system"), None)
+            self.messages.clear()
+            if system_message:
+                self.messages.append(system_message)
+            self._reset_summary()
+    
+    def _reset_summary(self) -> None:
+        """Forget the summary state after the history was replaced; call with the lock held."""
+        self.summary = None
+        self.summarized = 0
+        self._history_offset = 0
+        self._history_generation += 1
+    
+    def close(self) -> None:
+        """Flush pending messages and release the database connections."""
+        # A summary still being written is dropped; its turns are folded in next session
+        with self._lock:
+            self._closed = True
+        if self.vector_index is not None and self._owns_index:
+            self.vector_index.close()
+        if self._owns_db:
+            self.message_db.close()
+        else:
+            self.message_db.flush()
+        if self.response_cache is not None and self._owns_cache:
+            self.response_cache.close()
     
     def save_conversation(self, filename: str) -> bool:
         """
         Save the conversation history to a file.
         
+        .jsonl, .gz, .zst and .parquet files are written in chunks by the
+        exporter; any other name gets the original JSON array.
+        
         Args:
             filename: The name of the file to save to
         
         Returns:
             bool: True if successful, False otherwise
         """
+        # Snapshot under the lock: a request may append while the file is written
+        with self._lock:
+            messages = list(self.messages)
         try:
+            if filename.lower().endswith(EXPORT_SUFFIXES):
+                chunks = (messages[i:i + 1000] for i in range(0, len(messages), 1000))
+                write_records(filename, chunks)
+                return True
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.messages, f, indent=2, ensure_ascii=False)
+                json.dump(messages, f, indent=2, ensure_ascii=False)
             return True
         except Exception as e:
             print(f"Error saving conversation: {e}")
@@ -162,6 +818,8 @@ class ChatBot:
         """
         Load a conversation history from a file.
         
+        Reads every format save_conversation writes.
+        
         Args:
             filename: The name of the file to load from
         
@@ -169,8 +827,14 @@ class ChatBot:
             bool: True if successful, False otherwise
         """
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                self.messages = json.load(f)
+            if filename.lower().endswith(EXPORT_SUFFIXES):
+                messages = read_records(filename)
+            else:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    messages = json.load(f)
+            with self._lock:
+                self.messages = messages
+                self._reset_summary()
             return True
         except Exception as e:
             print(f"Error loading conversation: {e}")
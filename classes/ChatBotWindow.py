@@ -1,16 +1,33 @@
 from PyQt6.QtWidgets import (
     QMainWindow, QTextEdit, QPushButton, QVBoxLayout, 
-    QHBoxLayout, QWidget, QProgressBar, QMenu, QMessageBox
+    QHBoxLayout, QWidget, QProgressBar, QMenu, QMessageBox, QInputDialog, QFileDialog
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QThreadPool, QTimer, pyqtSignal
 from PyQt6.QtGui import QAction
 from datetime import datetime
-import json
-from .MessageDatabase import MessageDatabase
-from .ChatBot import ChatBot
+from typing import Optional
+from .MessageDatabase import MessageDatabase, DatabaseConfig
+from .ChatBot import ChatBot, ChatBotConfig
+from .ChatWorker import ChatWorker, TaskWorker
+from .ChatView import ChatView, ChatMessageModel
+from .MessageFormatter import MessageFormatter
+from .ChatExporter import ChatExporter
+from .Metrics import metrics
 from .styles import STYLES, get_dark_palette
 
 class ChatBotWindow(QMainWindow):
+    # Number of messages fetched per history page
+    HISTORY_PAGE_SIZE = 50
+    # Milliseconds between repaints of streaming responses
+    STREAM_REFRESH_MS = 50
+    # Number of responses that may be generated at the same time
+    MAX_CONCURRENT_REQUESTS = 4
+    # Turns folded into the conversation summary at a time
+    SUMMARIZE_EVERY_TURNS = 10
+    
+    # Emitted once storage and history are loaded and the window accepts input
+    ready = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AI Chat Assistant")
@@ -19,26 +36,103 @@ class ChatBotWindow(QMainWindow):
         # Set dark theme
         self.setPalette(get_dark_palette())
         
+        self.formatter = MessageFormatter(STYLES["message_styles"])
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(self.MAX_CONCURRENT_REQUESTS)
+        self.active_requests = {}
+        self.next_request_id = 0
+        
         self.setup_ui()
         self.setup_menu()
         
-        self.chatbot = ChatBot()
-        self.message_db = MessageDatabase()
-        self.load_messages()
+        self.message_db = None
+        self.chatbot = None
+        self.chat_model = None
         
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setInterval(self.STREAM_REFRESH_MS)
+        self.stream_timer.timeout.connect(self.flush_streaming_updates)
+        
+        # Show the window first; migrations and history load off the GUI thread
+        self.set_ready(False)
         self.show()
+        self.startup_worker = TaskWorker(self.open_storage)
+        self.startup_worker.signals.finished.connect(self.on_storage_ready)
+        self.startup_worker.signals.error.connect(self.on_storage_error)
+        self.thread_pool.start(self.startup_worker)
+    
+    def open_storage(self):
+        """Open the database and the latest conversation; runs on a worker thread."""
+        # One database for the window and the ChatBot; the ChatBot is the only writer of messages
+        message_db = MessageDatabase(config=DatabaseConfig(write_batch_size=32))
+        # Long sessions send a rolling summary plus recent turns instead of the whole transcript
+        chatbot = ChatBot(ChatBotConfig(summarize_every=self.SUMMARIZE_EVERY_TURNS), message_db=message_db)
+        
+        # Continue the most recently active conversation
+        latest = message_db.list_conversations(limit=1)
+        if latest:
+            chatbot.open_conversation(latest[0][0])
+        return message_db, chatbot
+    
+    def on_storage_ready(self, result):
+        self.message_db, self.chatbot = result
+        self.chat_model = ChatMessageModel(self.message_db, self.format_message, page_size=self.HISTORY_PAGE_SIZE)
+        self.chat_area.setModel(self.chat_model)
+        self.load_messages()
+        self.set_ready(True)
+        
+        # Load the OpenAI SDK in the background so the first message does not wait for it
+        self.warmup_worker = TaskWorker(lambda: self.chatbot.client)
+        self.thread_pool.start(self.warmup_worker)
+        self.ready.emit()
+    
+    def on_storage_error(self, message):
+        self.statusBar().showMessage("Failed to start")
+        self.show_error("Error", f"Failed to open chat history: {message}")
+    
+    def set_ready(self, ready: bool):
+        """Enable input once storage is available."""
+        self.menuBar().setEnabled(ready)
+        self.input_field.setEnabled(ready)
+        self.send_button.setEnabled(ready)
+        self.clear_button.setEnabled(ready)
+        if ready:
+            self.statusBar().clearMessage()
+            self.input_field.setFocus()
+        else:
+            self.statusBar().showMessage("Loading chat history...")
     
     def setup_menu(self):
         menubar = self.menuBar()
         file_menu = menubar.addMenu('File')
         
+        self.new_action = QAction('New Chat', self)
+        self.new_action.triggered.connect(self.new_chat)
+        file_menu.addAction(self.new_action)
+        
+        self.open_menu = file_menu.addMenu('Open Chat')
+        self.open_menu.aboutToShow.connect(self.populate_open_menu)
+        
+        self.delete_action = QAction('Delete Chat', self)
+        self.delete_action.triggered.connect(self.delete_chat)
+        file_menu.addAction(self.delete_action)
+        
+        file_menu.addSeparator()
+        
         export_action = QAction('Export Chat', self)
         export_action.triggered.connect(self.export_chat)
         file_menu.addAction(export_action)
         
-        clear_action = QAction('Clear Chat', self)
-        clear_action.triggered.connect(self.clear_chat)
-        file_menu.addAction(clear_action)
+        self.clear_action = QAction('Clear Chat', self)
+        self.clear_action.triggered.connect(self.clear_chat)
+        file_menu.addAction(self.clear_action)
+        
+        edit_menu = menubar.addMenu('Edit')
+        
+        search_action = QAction('Search History...', self)
+        search_action.setShortcut('Ctrl+F')
+        search_action.triggered.connect(self.search_history)
+        edit_menu.addAction(search_action)
     
     def setup_ui(self):
         # Create central widget and main layout
@@ -47,10 +141,8 @@ class ChatBotWindow(QMainWindow):
         layout = QVBoxLayout(central_widget)
         
         # Chat area
-        self.chat_area = QTextEdit()
-        self.chat_area.setReadOnly(True)
-        self.chat_area.setStyleSheet(STYLES["chat_area"])
-        self.chat_area.setAcceptRichText(True)
+        self.chat_area = ChatView()
+        self.chat_area.setStyleSheet(STYLES["chat_view"])
         layout.addWidget(self.chat_area)
         
         # Progress bar
@@ -73,6 +165,12 @@ class ChatBotWindow(QMainWindow):
         self.send_button.clicked.connect(self.send_message)
         button_layout.addWidget(self.send_button)
         
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setStyleSheet(STYLES["stop_button"])
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_responses)
+        button_layout.addWidget(self.stop_button)
+        
         self.clear_button = QPushButton("Clear")
         self.clear_button.setStyleSheet(STYLES["clear_button"])
         self.clear_button.clicked.connect(self.clear_chat)
@@ -93,77 +191,114 @@ class ChatBotWindow(QMainWindow):
     
     def send_message(self):
         user_message = self.input_field.toPlainText().strip()
-        if user_message:
+        if user_message and self.chatbot is not None:
             self.input_field.clear()
             self.add_message_to_ui(role="user", content=user_message)
             
-            # Show progress bar
-            self.progress_bar.setVisible(True)
-            self.progress_bar.setRange(0, 0)
-            self.send_button.setEnabled(False)
+            # Reserve the response's place now so concurrent replies stay in order
+            key = self.begin_streaming_message()
+            
+            # Pin the request to this conversation; switching is disabled until it finishes
+            conversation_id = self.chatbot.ensure_conversation(title=user_message)
+            # Queue the turn here, in send order; pool threads may start in any order
+            ticket = self.chatbot.reserve_turn()
+            self.next_request_id += 1
+            worker = ChatWorker(self.next_request_id, self.chatbot, user_message, conversation_id, ticket)
+            worker.signals.delta.connect(self.on_response_delta)
+            worker.signals.finished.connect(self.on_response_finished)
+            worker.signals.error.connect(self.on_response_error)
+            worker.signals.cancelled.connect(self.on_response_cancelled)
+            self.active_requests[worker.request_id] = {"worker": worker, "key": key, "parts": [], "dirty": False}
+            self.update_progress()
+            self.stream_timer.start()
             
-            # Use QTimer to process the response asynchronously
-            QTimer.singleShot(0, lambda: self.process_response(user_message))
+            # Run the blocking API call off the GUI thread
+            self.thread_pool.start(worker)
     
-    def process_response(self, user_message):
-        try:
-            assistant_response = self.chatbot.chat(user_message)
-            self.add_message_to_ui(role="assistant", content=assistant_response)
-        except Exception as e:
-            self.show_error("Error", f"Failed to get response: {str(e)}")
-        finally:
-            self.progress_bar.setVisible(False)
-            self.send_button.setEnabled(True)
+    def on_response_delta(self, request_id, delta):
+        request = self.active_requests.get(request_id)
+        if request is None:
+            return
+        request["parts"].append(delta)
+        request["dirty"] = True
+    
+    def on_response_finished(self, request_id, content):
+        request = self.active_requests.pop(request_id, None)
+        if request is None:
+            return
+        # The ChatBot has already stored the response
+        self.finish_streaming_message(request["key"], content)
+        self.update_progress()
+    
+    def on_response_error(self, request_id, message):
+        request = self.active_requests.pop(request_id, None)
+        if request is not None:
+            self.finish_streaming_message(request["key"], "".join(request["parts"]))
+        self.update_progress()
+        self.show_error("Error", f"Failed to get response: {message}")
+    
+    def on_response_cancelled(self, request_id, partial):
+        request = self.active_requests.pop(request_id, None)
+        if request is not None:
+            self.finish_streaming_message(request["key"], partial + "\n\n[Stopped]")
+        self.update_progress()
+    
+    def stop_responses(self):
+        """Cancel every response that is still being generated."""
+        for request in self.active_requests.values():
+            request["worker"].cancel()
     
-    def format_message(self, role: str, content: str, timestamp: str) -> str:
+    def update_progress(self):
+        busy = bool(self.active_requests)
+        self.progress_bar.setVisible(busy)
+        self.progress_bar.setRange(0, 0)
+        self.stop_button.setEnabled(busy)
+        # Answers still streaming belong to the current conversation
+        for widget in (self.new_action, self.open_menu, self.delete_action, self.clear_action, self.clear_button):
+            widget.setEnabled(not busy)
+    
+    def begin_streaming_message(self):
+        """Append an empty assistant message that receives streamed text."""
+        key = self.chat_model.append_message("assistant", "")
+        self.chat_area.scroll_to_bottom()
+        return key
+    
+    def flush_streaming_updates(self):
+        """Push accumulated deltas to the view; runs on a timer to batch repaints."""
+        with metrics.timer("ui_stream_refresh_seconds"):
+            for request in self.active_requests.values():
+                if request["dirty"]:
+                    request["dirty"] = False
+                    self.chat_model.update_message(request["key"], "".join(request["parts"]))
+        if not self.active_requests:
+            self.stream_timer.stop()
+    
+    def finish_streaming_message(self, key, content: str):
+        self.chat_model.update_message(key, content)
+    
+    def format_message(self, role: str, content: str, timestamp: str, message_id: Optional[int] = None) -> str:
         """Format a message using HTML templates from styles."""
-        # Replace code blocks with styled pre tags
-        if "```" in content:
-            parts = content.split("```")
-            for i in range(1, len(parts), 2):
-                if i < len(parts):
-                    code = parts[i].strip()
-                    parts[i] = f'<pre style="background-color: #1E1E1E; padding: 10px; border-radius: 5px; font-family: monospace;">{code}</pre>'
-            content = "".join(parts)
-        else:
-            # Replace newlines with <br> for non-code content
-            content = content.replace("\n", "<br>")
-        
-        # Get the appropriate message style template
-        template = STYLES["message_styles"][role]
-        
-        # Replace placeholders with actual content
-        return template.replace("%time%", timestamp).replace("%content%", content)
+        return self.formatter.format(role, content, timestamp, message_id)
     
     def add_message_to_ui(self, role, content):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        # Format message with HTML
-        formatted_message = self.format_message(role, content, timestamp)
-        
-        # Store in database
-        self.message_db.add_message(role=role, content=content)
-        
-        # Add to UI
-        self.chat_area.append(formatted_message)
+        # Display only: the ChatBot stores the message when the request runs
+        self.chat_model.append_message(role, content)
         
         # Scroll to bottom
-        scrollbar = self.chat_area.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        self.chat_area.scroll_to_bottom()
     
     def load_messages(self):
+        # Only the newest page is read; older pages load as the user scrolls up
         try:
-            messages = self.message_db.get_messages()
-            for message in messages:
-                role = message[2]
-                content = message[4]
-                timestamp = datetime.fromisoformat(message[1]).strftime("%H:%M:%S")
-                formatted_message = self.format_message(role, content, timestamp)
-                self.chat_area.append(formatted_message)
+            with metrics.timer("ui_load_messages_seconds"):
+                self.chat_model.load_conversation(self.chatbot.conversation_id)
+                self.chat_area.scroll_to_bottom()
         except Exception as e:
             self.show_error("Error", f"Failed to load messages: {str(e)}")
     
     def clear_chat(self):
+        if self.active_requests:
+            return
         reply = QMessageBox.question(
             self, 'Clear Chat',
             'Are you sure you want to clear the chat history?',
@@ -172,25 +307,93 @@ class ChatBotWindow(QMainWindow):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            self.chat_area.clear()
-            self.message_db.clear_messages()
+            self.chat_model.clear()
+            if self.chatbot.conversation_id is not None:
+                self.message_db.clear_messages(conversation_id=self.chatbot.conversation_id)
+            self.chatbot.clear_conversation()
+    
+    def new_chat(self):
+        if self.active_requests:
+            return
+        self.chatbot.new_conversation()
+        self.chat_model.clear()
+    
+    def populate_open_menu(self):
+        self.open_menu.clear()
+        for conversation_id, title, _, updated_at in self.message_db.list_conversations(limit=20):
+            label = f"{title or 'Untitled'} ({updated_at[:16].replace('T', ' ')})"
+            action = QAction(label, self)
+            action.triggered.connect(lambda checked=False, cid=conversation_id: self.open_chat(cid))
+            self.open_menu.addAction(action)
+    
+    def open_chat(self, conversation_id):
+        if self.active_requests:
+            return
+        if self.chatbot.open_conversation(conversation_id):
+            self.chat_model.clear()
+            self.load_messages()
+    
+    def delete_chat(self):
+        conversation_id = self.chatbot.conversation_id
+        if conversation_id is None or self.active_requests:
+            return
+        
+        reply = QMessageBox.question(
+            self, 'Delete Chat',
+            'Are you sure you want to delete this conversation?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        
+        if reply == QMessageBox.StandardButton.Yes:
+            self.message_db.delete_conversation(conversation_id)
+            self.new_chat()
+    
+    def search_history(self):
+        query, ok = QInputDialog.getText(self, 'Search History', 'Search for:')
+        if not ok or not query.strip():
+            return
+        
+        results = self.message_db.search(query, limit=20)
+        if not results:
+            QMessageBox.information(self, "Search History", f"No messages match '{query}'.")
+            return
+        
+        lines = [
+            f"{created_at[:16].replace('T', ' ')} [{role}] {snippet}"
+            for _, _, role, created_at, snippet in results
+        ]
+        QMessageBox.information(self, "Search History", "\n\n".join(lines))
     
     def export_chat(self):
-        messages = self.message_db.get_messages()
-        chat_data = [{
-            'timestamp': msg[1],
-            'role': msg[2],
-            'content': msg[4]
-        } for msg in messages]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Chat",
+            f"chat_export_{timestamp}.jsonl",
+            "JSON Lines (*.jsonl);;Compressed JSON Lines (*.jsonl.gz);;Parquet (*.parquet)"
+        )
+        if not filename:
+            return
         
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"chat_export_{timestamp}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(chat_data, f, indent=2, ensure_ascii=False)
-            QMessageBox.information(self, "Success", f"Chat exported to {filename}")
+            # Messages are streamed in chunks, so long histories are never loaded at once
+            count = ChatExporter(self.message_db).export(filename, conversation_id=self.chatbot.conversation_id)
+            QMessageBox.information(self, "Success", f"Exported {count} messages to {filename}")
         except Exception as e:
             self.show_error("Error", f"Failed to export chat: {str(e)}")
     
+    def closeEvent(self, event):
+        # Let in-flight responses wind down before the database closes
+        self.stop_responses()
+        self.thread_pool.waitForDone(5000)
+        
+        # Make sure queued messages reach the database before exiting
+        if self.chatbot is not None:
+            self.chatbot.close()
+        if self.message_db is not None:
+            self.message_db.close()
+        super().closeEvent(event)
+    
     def show_error(self, title, message):
         QMessageBox.critical(self, title, message)
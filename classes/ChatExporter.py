@@ -0,0 +1,210 @@
+import gzip
+import io
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+from .MessageDatabase import MessageDatabase
+
+EXPORT_COLUMNS = ["id", "conversation_id", "created_at", "role", "username", "content", "metadata", "uid"]
+# Parquet types of the export columns, all nullable. Declared rather than inferred:
+# a first chunk of legacy rows has no metadata and would type the column as null.
+# created_at stays a string, exactly as stored.
+EXPORT_TYPES = {
+    "id": "int64",
+    "conversation_id": "int64",
+    "created_at": "string",
+    "role": "string",
+    "username": "string",
+    "content": "string",
+    "metadata": "string",
+    "uid": "string",
+}
+
+# File suffixes mapped to export formats, longest first so ".jsonl.gz" wins over ".gz"
+FORMAT_SUFFIXES = (
+    (".jsonl.gz", "jsonl.gz"),
+    (".jsonl.zst", "jsonl.zst"),
+    (".gz", "jsonl.gz"),
+    (".zst", "jsonl.zst"),
+    (".parquet", "parquet"),
+    (".jsonl", "jsonl"),
+)
+FORMATS = ("jsonl", "jsonl.gz", "jsonl.zst", "parquet")
+EXPORT_SUFFIXES = tuple(suffix for suffix, _ in FORMAT_SUFFIXES)
+
+def detect_format(path: str) -> str:
+    """
+    Pick the export format from a file name, defaulting to JSONL.
+
+    Args:
+        path: The output file path
+
+    Returns:
+        str: One of FORMATS
+    """
+    lowered = path.lower()
+    for suffix, fmt in FORMAT_SUFFIXES:
+        if lowered.endswith(suffix):
+            return fmt
+    return "jsonl"
+
+def write_records(
+    path: str,
+    chunks: Iterable[List[Dict]],
+    fmt: Optional[str] = None,
+    types: Optional[Dict[str, str]] = None
+) -> int:
+    """
+    Write chunks of records to a file, one chunk at a time.
+
+    Only the current chunk is held in memory, so the size of the export
+    does not depend on the size of the history. A failed write removes
+    the partial file.
+
+    Args:
+        path: The output file path
+        chunks: Iterable of lists of JSON-serializable dicts
+        fmt: Optional format (see FORMATS); detected from path by default
+        types: Optional Parquet column types by name (pyarrow aliases such as
+            "int64" or "string"); inferred from the first chunk otherwise
+
+    Returns:
+        int: Number of records written
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    try:
+        if fmt == "parquet":
+            return _write_parquet(path, chunks, types)
+
+        count = 0
+        with _open_binary(path, fmt) as f:
+            for chunk in chunks:
+                # One write per chunk keeps the number of (compressor) calls low
+                f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in chunk).encode('utf-8'))
+                count += len(chunk)
+        return count
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+def _open_binary(path: str, fmt: str):
+    if fmt == "jsonl.gz":
+        return gzip.open(path, 'wb')
+    if fmt == "jsonl.zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd export needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor().stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+def _write_parquet(path: str, chunks: Iterable[List[Dict]], types: Optional[Dict[str, str]] = None) -> int:
+    # Optional and slow to import, so only loaded for Parquet exports
+    try:
+        import pyarrow
+        import pyarrow.parquet as parquet
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow)")
+
+    schema = None
+    if types:
+        schema = pyarrow.schema([(name, pyarrow.type_for_alias(alias)) for name, alias in types.items()])
+    writer = None
+    count = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            # Each chunk becomes one row group
+            table = pyarrow.Table.from_pylist(chunk, schema=schema)
+            if writer is None:
+                writer = parquet.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            count += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        # Nothing to export: still leave a readable (empty) file behind
+        parquet.write_table(pyarrow.Table.from_pylist([], schema=schema), path)
+    return count
+
+def read_records(path: str, fmt: Optional[str] = None) -> List[Dict]:
+    """
+    Read back a file written by write_records.
+
+    Args:
+        path: The input file path
+        fmt: Optional format (see FORMATS); detected from path by default
+
+    Returns:
+        List of records, in file order
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as parquet
+        except ImportError:
+            raise RuntimeError("Parquet import needs the pyarrow package (pip install pyarrow)")
+        return parquet.read_table(path).to_pylist()
+
+    if fmt == "jsonl.zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd import needs the zstandard package (pip install zstandard)")
+        with open(path, 'rb') as raw, zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+            lines = io.TextIOWrapper(reader, encoding='utf-8')
+            return [json.loads(line) for line in lines if line.strip()]
+    opener = gzip.open if fmt == "jsonl.gz" else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ChatExporter:
+    """Streams stored messages to JSONL, compressed JSONL or Parquet files."""
+    def __init__(self, message_db: Optional[MessageDatabase] = None, chunk_size: int = 1000):
+        """
+        Initialize the exporter.
+
+        Args:
+            message_db: Optional MessageDatabase to export from
+            chunk_size: Number of messages read and written at a time
+        """
+        self.message_db = message_db or MessageDatabase()
+        self.chunk_size = max(chunk_size, 1)
+
+    def iter_records(self, conversation_id: Optional[int] = None):
+        """
+        Yield chunks of message records in id order.
+
+        Args:
+            conversation_id: Optional filter by conversation
+
+        Yields:
+            List of message dicts keyed by EXPORT_COLUMNS
+        """
+        for rows in self.message_db.iter_messages(
+            chunk_size=self.chunk_size,
+            columns=EXPORT_COLUMNS,
+            conversation_id=conversation_id
+        ):
+            yield [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+
+    def export(self, path: str, conversation_id: Optional[int] = None, fmt: Optional[str] = None) -> int:
+        """
+        Export messages to a file.
+
+        Args:
+            path: The output file path
+            conversation_id: Optional conversation to export; all messages by default
+            fmt: Optional format (see FORMATS); detected from path by default
+
+        Returns:
+            int: Number of messages exported
+        """
+        return write_records(path, self.iter_records(conversation_id), fmt, types=EXPORT_TYPES)
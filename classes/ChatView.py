@@ -0,0 +1,278 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QMenu, QApplication
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize
+from PyQt6.QtGui import QTextDocument, QAbstractTextDocumentLayout, QPalette, QAction
+from .Metrics import metrics
+
+# Custom item data roles
+KeyRole = Qt.ItemDataRole.UserRole + 1
+ContentRole = Qt.ItemDataRole.UserRole + 2
+
+class ChatMessageModel(QAbstractListModel):
+    """List model holding the loaded window of a conversation's messages."""
+    def __init__(
+        self,
+        message_db,
+        formatter: Callable[[str, str, str, Optional[int]], str],
+        page_size: int = 50,
+        parent=None
+    ):
+        """
+        Initialize the model.
+
+        Args:
+            message_db: MessageDatabase history pages are read from
+            formatter: Callable turning (role, content, timestamp, message_id) into HTML
+            page_size: Number of messages fetched per page
+            parent: Optional Qt parent
+        """
+        super().__init__(parent)
+        self.message_db = message_db
+        self.formatter = formatter
+        self.page_size = page_size
+        self.items: List[Dict] = []
+        self.conversation_id: Optional[int] = None
+        self._oldest_id: Optional[int] = None
+        self._has_older = False
+        self._next_local_key = 0
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            # HTML is rendered once per message version, on first display
+            if item["html"] is None:
+                item["html"] = self.formatter(item["role"], item["content"], item["timestamp"], item["id"])
+            return item["html"]
+        if role == KeyRole:
+            return (item["key"], item["version"])
+        if role == ContentRole:
+            return item["content"]
+        return None
+
+    def _make_item(self, message_id: Optional[int], role: str, content: str, timestamp: str) -> Dict:
+        if message_id is None:
+            # Messages created this session get negative keys until they have a row ID
+            self._next_local_key -= 1
+            key = self._next_local_key
+        else:
+            key = message_id
+        return {
+            "key": key,
+            "id": message_id,
+            "role": role,
+            "content": content,
+            "timestamp": timestamp,
+            "html": None,
+            "version": 0,
+        }
+
+    def _items_from_rows(self, rows) -> List[Dict]:
+        return [
+            self._make_item(message_id, role, content, datetime.fromisoformat(created_at).strftime("%H:%M:%S"))
+            for message_id, created_at, role, content in rows
+        ]
+
+    def _fetch_page(self, before_id: Optional[int] = None):
+        rows = self.message_db.get_messages_page(
+            limit=self.page_size,
+            before_id=before_id,
+            columns=["id", "created_at", "role", "content"],
+            conversation_id=self.conversation_id
+        )
+        if rows:
+            self._oldest_id = rows[0][0]
+        self._has_older = len(rows) == self.page_size
+        return rows
+
+    def load_conversation(self, conversation_id: Optional[int]) -> None:
+        """
+        Show the newest page of a conversation, discarding what was loaded.
+
+        Args:
+            conversation_id: The conversation to show, or None for an empty view
+        """
+        self.beginResetModel()
+        self.conversation_id = conversation_id
+        self.items = []
+        self._oldest_id = None
+        self._has_older = False
+        if conversation_id is not None:
+            self.items = self._items_from_rows(self._fetch_page())
+        self.endResetModel()
+
+    def has_older(self) -> bool:
+        return self._has_older
+
+    def fetch_older(self) -> int:
+        """
+        Prepend the page of messages preceding the oldest loaded one.
+
+        Returns:
+            int: Number of messages added
+        """
+        if not self._has_older:
+            return 0
+        items = self._items_from_rows(self._fetch_page(before_id=self._oldest_id))
+        if not items:
+            return 0
+        self.beginInsertRows(QModelIndex(), 0, len(items) - 1)
+        self.items[:0] = items
+        self.endInsertRows()
+        return len(items)
+
+    def append_message(self, role: str, content: str, timestamp: Optional[str] = None) -> int:
+        """
+        Append a message created in this session.
+
+        Args:
+            role: The role of the message sender
+            content: The message content
+            timestamp: Display timestamp (defaults to now)
+
+        Returns:
+            int: A stable key identifying the message in later updates
+        """
+        item = self._make_item(None, role, content, timestamp or datetime.now().strftime("%H:%M:%S"))
+        row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.append(item)
+        self.endInsertRows()
+        return item["key"]
+
+    def update_message(self, key: int, content: str) -> None:
+        """
+        Replace the content of a message, e.g. while a response streams in.
+
+        Args:
+            key: The key returned by append_message
+            content: The new message content
+        """
+        # Updated messages are almost always the newest, so search from the end
+        for row in range(len(self.items) - 1, -1, -1):
+            item = self.items[row]
+            if item["key"] == key:
+                item["content"] = content
+                item["html"] = None
+                item["version"] += 1
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+                return
+
+    def clear(self) -> None:
+        self.load_conversation(None)
+
+    def to_plain_text(self) -> str:
+        """Return the loaded messages as plain text."""
+        return "\n\n".join(f"[{item['timestamp']}] {item['role']}: {item['content']}" for item in self.items)
+
+class ChatMessageDelegate(QStyledItemDelegate):
+    """Paints message HTML, caching laid-out documents per message and width."""
+    def __init__(self, cache_size: int = 300, parent=None):
+        super().__init__(parent)
+        self.cache_size = cache_size
+        self._documents: "OrderedDict[tuple, QTextDocument]" = OrderedDict()
+
+    def _document(self, index: QModelIndex, width: int) -> QTextDocument:
+        key = (index.data(KeyRole), width)
+        document = self._documents.get(key)
+        if document is not None:
+            self._documents.move_to_end(key)
+            return document
+
+        with metrics.timer("ui_layout_seconds"):
+            document = QTextDocument()
+            document.setDocumentMargin(4)
+            document.setHtml(index.data(Qt.ItemDataRole.DisplayRole))
+            document.setTextWidth(width)
+        self._documents[key] = document
+        if len(self._documents) > self.cache_size:
+            self._documents.popitem(last=False)
+        return document
+
+    def paint(self, painter, option, index):
+        document = self._document(index, option.rect.width())
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.ColorRole.Text, option.palette.color(QPalette.ColorRole.Text))
+
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        width = option.rect.width()
+        if width <= 0 and option.widget is not None:
+            width = option.widget.viewport().width()
+        document = self._document(index, max(width, 1))
+        return QSize(width, int(document.size().height()))
+
+class ChatView(QListView):
+    """Virtualized chat history: only visible messages are laid out and painted."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setItemDelegate(ChatMessageDelegate(parent=self))
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.verticalScrollBar().valueChanged.connect(self._on_scroll)
+        self.verticalScrollBar().rangeChanged.connect(self._on_range_changed)
+        self._distance_from_bottom: Optional[int] = None
+        self._follow_bottom = True
+
+    def _on_scroll(self, value: int) -> None:
+        scrollbar = self.verticalScrollBar()
+        self._follow_bottom = value >= scrollbar.maximum() - 4
+        model = self.model()
+        if value == scrollbar.minimum() and model is not None and model.has_older() and self._distance_from_bottom is None:
+            # Keep the current messages in place while older ones are inserted above
+            self._distance_from_bottom = scrollbar.maximum() - value
+            if not model.fetch_older():
+                self._distance_from_bottom = None
+
+    def _on_range_changed(self, minimum: int, maximum: int) -> None:
+        scrollbar = self.verticalScrollBar()
+        if self._distance_from_bottom is not None:
+            scrollbar.setValue(maximum - self._distance_from_bottom)
+            self._distance_from_bottom = None
+        elif self._follow_bottom:
+            scrollbar.setValue(maximum)
+
+    def wheelEvent(self, event):
+        # Already at the top there is no valueChanged, so scrolling up must fetch explicitly
+        scrollbar = self.verticalScrollBar()
+        model = self.model()
+        if event.angleDelta().y() > 0 and scrollbar.value() == scrollbar.minimum() and model is not None:
+            if model.has_older() and self._distance_from_bottom is None:
+                self._distance_from_bottom = scrollbar.maximum() - scrollbar.value()
+                if not model.fetch_older():
+                    self._distance_from_bottom = None
+        super().wheelEvent(event)
+
+    def scroll_to_bottom(self) -> None:
+        self._follow_bottom = True
+        self.scrollToBottom()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # Wrapped heights depend on the width, so the layout must be redone
+        self.scheduleDelayedItemsLayout()
+
+    def show_context_menu(self, position) -> None:
+        index = self.indexAt(position)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        copy_action = QAction("Copy Message", menu)
+        copy_action.triggered.connect(lambda: QApplication.clipboard().setText(index.data(ContentRole)))
+        menu.addAction(copy_action)
+        menu.exec(self.viewport().mapToGlobal(position))
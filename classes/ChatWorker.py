@@ -0,0 +1,103 @@
+import threading
+from typing import Optional
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+class ChatWorkerSignals(QObject):
+    """Signals emitted by a ChatWorker; all carry the worker's request ID."""
+    delta = pyqtSignal(int, str)
+    finished = pyqtSignal(int, str)
+    error = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int, str)
+
+class ChatWorker(QRunnable):
+    """Runs a single streaming chat completion on a QThreadPool thread."""
+    def __init__(
+        self,
+        request_id: int,
+        chatbot,
+        user_message: str,
+        conversation_id: Optional[int] = None,
+        ticket: Optional[int] = None
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            request_id: Identifier echoed back in every signal
+            chatbot: The ChatBot used to stream the response
+            user_message: The user's input message
+            conversation_id: Conversation the message was sent in; the answer is stored there
+            ticket: Place in the chatbot's turn queue from reserve_turn(), taken when
+                the message was sent so replies run in send order
+        """
+        super().__init__()
+        self.request_id = request_id
+        self.chatbot = chatbot
+        self.user_message = user_message
+        self.conversation_id = conversation_id
+        self.ticket = ticket
+        self.signals = ChatWorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Ask the worker to stop; a turn still queued is dropped before it sends its request."""
+        self._cancelled.set()
+        if self.ticket is not None:
+            self.chatbot.cancel_turn(self.ticket)
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def run(self) -> None:
+        parts = []
+        try:
+            if self.is_cancelled():
+                self.signals.cancelled.emit(self.request_id, "")
+                return
+
+            stream = self.chatbot.chat_stream(
+                self.user_message,
+                conversation_id=self.conversation_id,
+                ticket=self.ticket
+            )
+            for delta in stream:
+                if self.is_cancelled():
+                    stream.close()
+                    self.signals.cancelled.emit(self.request_id, "".join(parts))
+                    return
+                parts.append(delta)
+                self.signals.delta.emit(self.request_id, delta)
+
+            # A turn dropped while queued ends without yielding anything
+            if not parts and self.is_cancelled():
+                self.signals.cancelled.emit(self.request_id, "")
+                return
+            self.signals.finished.emit(self.request_id, "".join(parts))
+        except Exception as e:
+            self.signals.error.emit(self.request_id, str(e))
+
+class TaskWorkerSignals(QObject):
+    """Signals emitted by a TaskWorker."""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class TaskWorker(QRunnable):
+    """Runs a blocking callable on a QThreadPool thread and reports its result."""
+    def __init__(self, func):
+        """
+        Initialize the worker.
+
+        Args:
+            func: Callable taking no arguments; its return value is emitted with finished
+        """
+        super().__init__()
+        self.func = func
+        self.signals = TaskWorkerSignals()
+
+    def run(self) -> None:
+        try:
+            result = self.func()
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            return
+        self.signals.finished.emit(result)
@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to a character-based estimate
+    tiktoken = None
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokens the chat format adds to prime the reply
+REPLY_OVERHEAD_TOKENS = 3
+
+def summary_message(summary: str) -> Dict[str, str]:
+    """Wrap a summary of earlier turns in the system message sent in their place."""
+    return {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+
+class TokenCounter:
+    """Counts message tokens, caching the result for each message."""
+    def __init__(self, model: str = "gpt-3.5-turbo", cache_size: int = 10000):
+        """
+        Initialize the token counter.
+
+        Args:
+            model: Model name used to pick the tiktoken encoding
+            cache_size: Maximum number of cached per-message counts
+        """
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # The encoding is downloaded on first use, which fails offline
+                print(f"Error loading the tokenizer, estimating token counts instead: {e}")
+
+    def count_text(self, text: str) -> int:
+        """Count the tokens in a piece of text."""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        # Roughly four characters per token for English text and code
+        return (len(text) + 3) // 4
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        """Count the tokens a single chat message costs, including format overhead."""
+        key = (message["role"], message["content"])
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        tokens = self.count_text(message["content"] or "") + MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        """Count the tokens a full request's message list costs."""
+        return sum(self.count_message(message) for message in messages) + REPLY_OVERHEAD_TOKENS
+
+class ContextBuilder:
+    """Builds the message list for a request so it stays within a token budget."""
+    def __init__(self, max_tokens: int, token_counter: Optional[TokenCounter] = None):
+        """
+        Initialize the context builder.
+
+        Args:
+            max_tokens: Token budget for the prompt messages of one request
+            token_counter: Optional TokenCounter (a default one is created otherwise)
+        """
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter or TokenCounter()
+
+    def build(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Select the messages to send for the next request.
+
+        System messages are always kept. The remaining turns are taken from
+        newest to oldest until the budget is used up; the latest message is
+        always sent. Dropped turns are left out; ChatBot folds old turns into
+        a rolling summary instead (see ConversationSummarizer).
+
+        Args:
+            messages: The full conversation history
+
+        Returns:
+            List of message dictionaries to send
+        """
+        if self.token_counter.count_messages(messages) <= self.max_tokens:
+            return list(messages)
+
+        system = [message for message in messages if message["role"] == "system"]
+        turns = [message for message in messages if message["role"] != "system"]
+
+        used = self.token_counter.count_messages(system)
+        kept: List[Dict[str, str]] = []
+        for message in reversed(turns):
+            tokens = self.token_counter.count_message(message)
+            if kept and used + tokens > self.max_tokens:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        return system + kept
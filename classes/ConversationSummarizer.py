@@ -0,0 +1,120 @@
+import threading
+from typing import Callable, Dict, List, Optional
+from .Metrics import metrics
+
+# Instructions for the model that maintains a conversation's rolling summary
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and a coding assistant. "
+    "Update the summary with the new messages. Keep requirements, decisions, names, code "
+    "identifiers and open questions; drop greetings and repetition. "
+    "Reply with the updated summary only."
+)
+
+def build_summary_messages(summary: Optional[str], messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Build the request that folds new messages into an existing summary.
+
+    Args:
+        summary: The current summary, or None for the first compaction
+        messages: The messages to fold in, oldest first
+
+    Returns:
+        List of message dictionaries to send to the summarizing model
+    """
+    transcript = "\n\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    parts = [f"Current summary:\n{summary}"] if summary else []
+    parts.append(f"New messages:\n{transcript}")
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": "\n\n".join(parts)},
+    ]
+
+class ConversationSummarizer:
+    """Folds older turns into a rolling summary on a background thread, a few turns at a time."""
+    def __init__(
+        self,
+        summarize: Callable[[Optional[str], List[Dict[str, str]]], str],
+        every_turns: int = 10,
+        keep_recent: int = 6
+    ):
+        """
+        Initialize the summarizer.
+
+        Args:
+            summarize: Callable taking the current summary (None at first) and the
+                messages to fold in, and returning the updated summary. ChatBot
+                passes one that asks the chat model; tests can pass a stub.
+            every_turns: Number of user/assistant turns folded in per compaction
+            keep_recent: Number of most recent messages that are never folded in
+        """
+        self.summarize = summarize
+        self.every_turns = max(every_turns, 1)
+        self.keep_recent = max(keep_recent, 0)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def next_batch(self, summarized: int, total: int) -> Optional[int]:
+        """
+        Decide whether a compaction is due.
+
+        Args:
+            summarized: Number of leading messages already covered by the summary
+            total: Number of messages in the conversation
+
+        Returns:
+            The end index of the messages to fold in next, or None if fewer
+            than every_turns turns are waiting beyond the recent ones
+        """
+        end = summarized + 2 * self.every_turns
+        if end > total - self.keep_recent:
+            return None
+        return end
+
+    def start(
+        self,
+        summary: Optional[str],
+        messages: List[Dict[str, str]],
+        on_done: Callable[[str], None]
+    ) -> bool:
+        """
+        Summarize messages in the background unless a compaction is already running.
+
+        Args:
+            summary: The current summary, or None
+            messages: The messages to fold in, oldest first
+            on_done: Called from the background thread with the updated summary;
+                not called if summarizing fails
+
+        Returns:
+            bool: True if the compaction was started
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(summary, messages, on_done),
+                name="ConversationSummarizer",
+                daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, summary: Optional[str], messages: List[Dict[str, str]], on_done: Callable[[str], None]) -> None:
+        try:
+            with metrics.timer("chat_summarize_seconds"):
+                updated = self.summarize(summary, messages)
+        except Exception as e:
+            metrics.increment("chat_summary_errors_total")
+            print(f"Error summarizing conversation: {e}")
+            return
+        if updated:
+            metrics.increment("chat_summaries_total")
+            on_done(updated)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for a running compaction to finish."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
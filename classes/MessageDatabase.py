@@ -1,27 +1,270 @@
+import ast
+import json
+import os
 import sqlite3
 import datetime
-from typing import List, Dict, Optional, Tuple
+import queue
+import threading
+import uuid
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
 from contextlib import contextmanager
+from .MessageWriter import MessageWriter
+from .Metrics import metrics
+
+class DatabaseConfig:
+    """Configuration class for MessageDatabase connection settings."""
+    def __init__(
+        self,
+        pool_size: int = 4,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        cache_size_kb: int = 8192,
+        busy_timeout_ms: int = 5000,
+        mmap_size: int = 0,
+        write_batch_size: int = 0,
+        write_flush_interval: float = 1.0,
+        durability: str = "normal",
+        write_queue_size: int = 10000
+    ):
+        """
+        Args:
+            pool_size: Number of long-lived connections to keep open.
+                0 opens a fresh connection per operation (legacy behaviour).
+            journal_mode: SQLite journal mode (WAL, DELETE, TRUNCATE, ...)
+            synchronous: SQLite synchronous level (OFF, NORMAL, FULL, EXTRA)
+            cache_size_kb: Page cache size per connection in KiB
+            busy_timeout_ms: How long to wait on a locked database
+            mmap_size: Bytes of the database file to memory-map (0 disables)
+            write_batch_size: Write messages behind the caller's back, committing
+                up to this many per transaction from a background thread.
+                0 writes every message synchronously in its own transaction.
+            write_flush_interval: Seconds between retries of a failed background write
+            durability: Synchronous level for background writes ("off", "normal", "full")
+            write_queue_size: Maximum number of messages waiting to be written;
+                add_message blocks while the queue is full
+        """
+        self.pool_size = pool_size
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self.durability = durability
+        self.write_queue_size = write_queue_size
+
+def apply_pragmas(conn: sqlite3.Connection, config: DatabaseConfig) -> None:
+    """Apply journaling, durability and cache pragmas to a connection."""
+    conn.execute(f"PRAGMA busy_timeout = {int(config.busy_timeout_ms)}")
+    conn.execute(f"PRAGMA journal_mode = {config.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {config.synchronous}")
+    conn.execute(f"PRAGMA cache_size = {-int(config.cache_size_kb)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+    if config.mmap_size:
+        conn.execute(f"PRAGMA mmap_size = {int(config.mmap_size)}")
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections."""
+    def __init__(self, db_path: str, config: DatabaseConfig):
+        self.db_path = db_path
+        self.config = config
+        # An in-memory database only exists for the connection that created it
+        self.size = 1 if db_path == ":memory:" else max(config.pool_size, 1)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=self.size)
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply the configured pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.config.busy_timeout_ms / 1000,
+            check_same_thread=False
+        )
+        apply_pragmas(conn, self.config)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool, opening one lazily if needed."""
+        conn = None
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if len(self._connections) < self.size:
+                    conn = self._connect()
+                    self._connections.append(conn)
+            if conn is None:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            # Never hand a half-finished transaction to the next borrower
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def close(self) -> None:
+        """Close every connection owned by the pool."""
+        with self._lock:
+            self._closed = True
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+# Columns callers may request from the messages table
+MESSAGE_COLUMNS = ("id", "created_at", "role", "username", "content", "metadata", "conversation_id", "uid")
+
+# Schema version (PRAGMA user_version) written by the last step of MessageDatabase._migrations
+SCHEMA_VERSION = 5
+
+# Rows per transaction when a migration rewrites every message
+MIGRATION_CHUNK_SIZE = 5000
+
+# Databases this process has already brought up to date, mapped to whether
+# full-text search is available; later instances skip the schema check
+_migrated_databases: Dict[Tuple, bool] = {}
+_schema_lock = threading.Lock()
 
 class MessageDatabase:
-    def __init__(self, db_path: str = 'llmdb.db'):
+    def __init__(self, db_path: str = 'llmdb.db', config: Optional[DatabaseConfig] = None):
+        """
+        Initialize the message database.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            config: Optional DatabaseConfig instance for connection tuning
+        """
         self.db_path = db_path
         self.table_name = "messages"
-        self._ensure_table_exists()
+        self.conversations_table = "conversations"
+        self.fts_table = f"{self.table_name}_fts"
+        self.summaries_table = "conversation_summaries"
+        self.fts_enabled = False
+        self.config = config or DatabaseConfig()
+        self._pool = ConnectionPool(db_path, self.config) if self.config.pool_size > 0 else None
         self._migrate_database()
+        self._writer = None
+        if self.config.write_batch_size > 0:
+            self._writer = MessageWriter(
+                self,
+                batch_size=self.config.write_batch_size,
+                flush_interval=self.config.write_flush_interval,
+                durability=self.config.durability,
+                max_pending=self.config.write_queue_size
+            )
     
     @contextmanager
     def _get_connection(self):
         """Context manager for database connections."""
-        conn = sqlite3.connect(self.db_path)
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+            return
+        
+        conn = sqlite3.connect(self.db_path, timeout=self.config.busy_timeout_ms / 1000)
         try:
+            apply_pragmas(conn, self.config)
             yield conn
         finally:
             conn.close()
     
-    def _ensure_table_exists(self) -> None:
-        """Ensures the messages table exists in the database."""
-        create_table_sql = f'''
+    def flush(self) -> bool:
+        """
+        Wait until every message queued so far is written to disk.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self._writer is None:
+            return True
+        return self._writer.flush()
+    
+    def close(self) -> None:
+        """Flush buffered messages and close all pooled connections."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._pool is not None:
+            self._pool.close()
+    
+    def _migrations(self) -> List[Tuple[int, Callable[[sqlite3.Connection], None]]]:
+        """
+        Ordered schema upgrades as (version, step) pairs.
+        
+        A step runs when PRAGMA user_version is below its version and must be
+        safe to re-run, since an interrupted step is retried on the next start.
+        Append new steps with the next version number; never reorder them.
+        """
+        return [
+            (1, self._migrate_base_schema),
+            (2, self._migrate_model_index),
+            (3, self._migrate_fts),
+            (4, self._migrate_summaries),
+            (5, self._migrate_usage_index),
+        ]
+    
+    def _migrate_database(self) -> None:
+        """Brings the schema up to SCHEMA_VERSION, checking a current database with one read."""
+        key = self._schema_key()
+        with _schema_lock:
+            if key is not None and key in _migrated_databases:
+                self.fts_enabled = _migrated_databases[key]
+                return
+            
+            try:
+                with self._get_connection() as conn:
+                    version = self._schema_state(conn)[0]
+                    for target, step in self._migrations():
+                        if version >= target:
+                            continue
+                        # Hold the write lock while re-checking, in case another process got here first
+                        conn.execute("BEGIN IMMEDIATE")
+                        if conn.execute("PRAGMA user_version").fetchone()[0] >= target:
+                            conn.rollback()
+                        else:
+                            step(conn)
+                            conn.execute(f"PRAGMA user_version = {target}")
+                            conn.commit()
+                        version = target
+                    self.fts_enabled = self._schema_state(conn)[1]
+            except Exception as e:
+                print(f"Error during database migration: {e}")
+                return
+            
+            # The database file may be replaced while the process runs, so the key includes its inode
+            key = self._schema_key()
+            if key is not None:
+                _migrated_databases[key] = self.fts_enabled
+    
+    def _schema_key(self) -> Optional[Tuple]:
+        """Identify the database file for the process-level migration cache."""
+        if self.db_path == ":memory:":
+            return None
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (os.path.abspath(self.db_path), stat.st_dev, stat.st_ino)
+    
+    def _schema_state(self, conn: sqlite3.Connection) -> Tuple[int, bool]:
+        """Return the schema version and whether the full-text index exists, in one query."""
+        version, fts = conn.execute(
+            "SELECT user_version, EXISTS(SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?) "
+            "FROM pragma_user_version",
+            (self.fts_table,)
+        ).fetchone()
+        return version, bool(fts)
+    
+    def _migrate_base_schema(self, conn: sqlite3.Connection) -> None:
+        """Version 1: tables, columns added since the first release, indexes and JSON metadata."""
+        cursor = conn.cursor()
+        cursor.execute(f'''
             CREATE TABLE IF NOT EXISTS {self.table_name} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 created_at TEXT NOT NULL,
@@ -29,83 +272,415 @@ class MessageDatabase:
                 username TEXT,
                 content TEXT NOT NULL
             )
-        '''
+        ''')
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.conversations_table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
         
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(create_table_sql)
+        # Older databases predate some columns
+        cursor.execute(f"PRAGMA table_info({self.table_name})")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'metadata' not in columns:
+            cursor.execute(f"ALTER TABLE {self.table_name} ADD COLUMN metadata TEXT")
+        
+        # Add conversation_id column and adopt pre-existing messages
+        if 'conversation_id' not in columns:
+            cursor.execute(
+                f"ALTER TABLE {self.table_name} ADD COLUMN conversation_id INTEGER "
+                f"REFERENCES {self.conversations_table}(id) ON DELETE CASCADE"
+            )
+            cursor.execute(f"SELECT MIN(created_at), MAX(created_at) FROM {self.table_name}")
+            first, last = cursor.fetchone()
+            if first is not None:
+                cursor.execute(
+                    f"INSERT INTO {self.conversations_table} (title, created_at, updated_at) VALUES (?, ?, ?)",
+                    ("Earlier messages", first, last)
+                )
+                cursor.execute(
+                    f"UPDATE {self.table_name} SET conversation_id = ? WHERE conversation_id IS NULL",
+                    (cursor.lastrowid,)
+                )
+        
+        # A caller-supplied unique ID makes writing the same message twice a no-op
+        if 'uid' not in columns:
+            cursor.execute(f"ALTER TABLE {self.table_name} ADD COLUMN uid TEXT")
+        cursor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table_name}_uid "
+            f"ON {self.table_name} (uid) WHERE uid IS NOT NULL"
+        )
+        
+        # Track where imported conversations came from so imports can be re-run
+        cursor.execute(f"PRAGMA table_info({self.conversations_table})")
+        conversation_columns = [column[1] for column in cursor.fetchall()]
+        if 'source' not in conversation_columns:
+            cursor.execute(f"ALTER TABLE {self.conversations_table} ADD COLUMN source TEXT")
+        if 'content_hash' not in conversation_columns:
+            cursor.execute(f"ALTER TABLE {self.conversations_table} ADD COLUMN content_hash TEXT")
+        cursor.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.conversations_table}_content_hash "
+            f"ON {self.conversations_table} (content_hash) WHERE content_hash IS NOT NULL"
+        )
+        
+        # Indexes backing ordered history reads and role filters
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_created_at ON {self.table_name} (created_at)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_role ON {self.table_name} (role, created_at)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_conversation ON {self.table_name} (conversation_id, id)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.conversations_table}_updated_at ON {self.conversations_table} (updated_at)")
+        
+        # Keep a conversation's updated_at in step with its newest message
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {self.table_name}_touch_conversation
+            AFTER INSERT ON {self.table_name}
+            WHEN NEW.conversation_id IS NOT NULL
+            BEGIN
+                UPDATE {self.conversations_table} SET updated_at = NEW.created_at
+                WHERE id = NEW.conversation_id;
+            END
+        ''')
+        conn.commit()
+        
+        self._convert_metadata(conn)
+    
+    def _convert_metadata(self, conn: sqlite3.Connection) -> None:
+        """Converts Python-repr metadata to JSON, committing chunk by chunk."""
+        converted = 0
+        for start, end in self._id_chunks(conn):
+            rows = conn.execute(
+                f"SELECT id, metadata FROM {self.table_name} "
+                "WHERE id > ? AND id <= ? AND metadata IS NOT NULL",
+                (start, end)
+            ).fetchall()
+            updates = [
+                (self._metadata_to_json(value), message_id)
+                for message_id, value in rows
+                if not self._is_json(value)
+            ]
+            if updates:
+                conn.executemany(f"UPDATE {self.table_name} SET metadata = ? WHERE id = ?", updates)
+                conn.commit()
+            converted += len(updates)
+        if converted:
+            print(f"Converted metadata of {converted} messages to JSON")
+    
+    def _id_chunks(self, conn: sqlite3.Connection) -> Iterator[Tuple[int, int]]:
+        """
+        Split the message ids into (start, end] ranges of MIGRATION_CHUNK_SIZE.
+        
+        Migrations touching every row commit once per range, releasing the
+        write lock in between, so the app and other processes keep writing
+        while a large history is migrated. Ids are fixed at the start;
+        rows inserted meanwhile are written in the new format already.
+        """
+        if conn.in_transaction:
             conn.commit()
+        last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table_name}").fetchone()[0]
+        for start in range(0, last_id, MIGRATION_CHUNK_SIZE):
+            yield start, min(start + MIGRATION_CHUNK_SIZE, last_id)
     
-    def _migrate_database(self) -> None:
-        """Handles database migrations to add new columns if needed."""
+    def _migrate_model_index(self, conn: sqlite3.Connection) -> None:
+        """Version 2: expression index backing the usage aggregations."""
+        # Led by role with the exact model expression of get_usage_stats, so its
+        # role = 'assistant' search returns rows grouped by model, no temporary b-tree
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                
-                # Check if metadata column exists
-                cursor.execute(f"PRAGMA table_info({self.table_name})")
-                columns = [column[1] for column in cursor.fetchall()]
-                
-                # Add metadata column if it doesn't exist
-                if 'metadata' not in columns:
-                    cursor.execute(f"ALTER TABLE {self.table_name} ADD COLUMN metadata TEXT")
-                    conn.commit()
-                    print("Added metadata column to messages table")
-        except Exception as e:
-            print(f"Error during database migration: {e}")
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_usage "
+                f"ON {self.table_name} (role, json_extract(metadata, '$.model'), created_at)"
+            )
+        except sqlite3.OperationalError as e:
+            # SQLite builds without JSON1 keep working, just without the index
+            print(f"Error migrating message metadata: {e}")
+    
+    def _migrate_usage_index(self, conn: sqlite3.Connection) -> None:
+        """Version 5: replace the first model index, which the usage query never used."""
+        conn.execute(f"DROP INDEX IF EXISTS idx_{self.table_name}_model")
+        self._migrate_model_index(conn)
+    
+    @staticmethod
+    def _is_json(value: str) -> bool:
+        try:
+            json.loads(value)
+            return True
+        except ValueError:
+            return False
     
-    def add_message(self, role: str, content: str, username: Optional[str] = None, metadata: Optional[Dict] = None) -> bool:
+    @staticmethod
+    def _metadata_to_json(value: str) -> str:
+        """Turn a legacy str(dict) metadata value into JSON."""
+        try:
+            return json.dumps(ast.literal_eval(value), ensure_ascii=False, default=str)
+        except (ValueError, SyntaxError):
+            return json.dumps({"raw": value}, ensure_ascii=False)
+    
+    @staticmethod
+    def parse_metadata(value: Optional[str]) -> Dict:
+        """
+        Decode a stored metadata value.
+        
+        Args:
+            value: The metadata column of a message row
+        
+        Returns:
+            dict: The metadata, or an empty dict if there is none
+        """
+        if not value:
+            return {}
+        try:
+            metadata = json.loads(value)
+        except ValueError:
+            return {}
+        return metadata if isinstance(metadata, dict) else {"value": metadata}
+    
+    def _migrate_fts(self, conn: sqlite3.Connection) -> None:
+        """Version 3: the FTS5 index and its sync triggers, backfilling existing rows in chunks."""
+        try:
+            cursor = conn.cursor()
+            # External content table: the text lives only in messages
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5(
+                    content,
+                    content='{self.table_name}',
+                    content_rowid='id'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite builds without FTS5 simply go without search
+            print(f"Full-text search unavailable: {e}")
+            return
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {self.table_name}_fts_insert
+            AFTER INSERT ON {self.table_name}
+            BEGIN
+                INSERT INTO {self.fts_table} (rowid, content) VALUES (NEW.id, NEW.content);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {self.table_name}_fts_delete
+            AFTER DELETE ON {self.table_name}
+            BEGIN
+                INSERT INTO {self.fts_table} ({self.fts_table}, rowid, content)
+                VALUES ('delete', OLD.id, OLD.content);
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {self.table_name}_fts_update
+            AFTER UPDATE OF content ON {self.table_name}
+            BEGIN
+                INSERT INTO {self.fts_table} ({self.fts_table}, rowid, content)
+                VALUES ('delete', OLD.id, OLD.content);
+                INSERT INTO {self.fts_table} (rowid, content) VALUES (NEW.id, NEW.content);
+            END
+        ''')
+        conn.commit()
+        
+        # Index only rows missing from the docsize shadow table: rows the triggers
+        # already indexed, or an interrupted earlier run covered, are skipped
+        indexed = 0
+        for start, end in self._id_chunks(conn):
+            cursor = conn.execute(
+                f'''
+                INSERT INTO {self.fts_table} (rowid, content)
+                SELECT m.id, m.content FROM {self.table_name} m
+                WHERE m.id > ? AND m.id <= ?
+                AND NOT EXISTS (SELECT 1 FROM {self.fts_table}_docsize d WHERE d.id = m.id)
+                ''',
+                (start, end)
+            )
+            conn.commit()
+            indexed += cursor.rowcount
+        if indexed:
+            print(f"Added {indexed} messages to the full-text search index")
+    
+    def _migrate_summaries(self, conn: sqlite3.Connection) -> None:
+        """Version 4: rolling conversation summaries."""
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.summaries_table} (
+                conversation_id INTEGER PRIMARY KEY
+                    REFERENCES {self.conversations_table}(id) ON DELETE CASCADE,
+                summary TEXT NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+    
+    def add_message(
+        self,
+        role: str,
+        content: str,
+        username: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        conversation_id: Optional[int] = None,
+        uid: Optional[str] = None
+    ) -> bool:
         """
         Add a new message to the database.
         
+        Writes are idempotent per uid: adding a message whose uid is already
+        stored does nothing, so a message can safely be written again (e.g.
+        after a retry) without creating a duplicate row.
+        
+        When write-behind is enabled (write_batch_size > 0) the message is
+        queued and written by the background writer; True then means the
+        message is queued and will be written before close() returns.
+        
         Args:
             role: The role of the message sender (user/assistant)
             content: The message content
             username: Optional username
             metadata: Optional metadata dictionary
+            conversation_id: Optional conversation the message belongs to
+            uid: Optional unique message ID (see new_uid); one is generated if omitted
         
         Returns:
             bool: True if successful, False otherwise
         """
+        row = self._build_row(role, content, username, metadata, conversation_id, uid)
+        if self._writer is not None:
+            self._writer.add(row)
+            return True
+        
         try:
-            with self._get_connection() as conn:
+            with self._get_connection() as conn, metrics.timer("db_add_message_seconds"):
                 cursor = conn.cursor()
-                cursor.execute(
-                    f"INSERT INTO {self.table_name} (created_at, role, username, content, metadata) VALUES (?, ?, ?, ?, ?)",
-                    (
-                        datetime.datetime.now().isoformat(),
-                        role,
-                        username,
-                        content,
-                        str(metadata) if metadata else None
-                    )
-                )
+                cursor.execute(self._insert_sql(), row)
                 conn.commit()
                 return True
         except Exception as e:
             print(f"Error adding message: {e}")
             return False
     
-    def get_messages(self, limit: Optional[int] = None, role: Optional[str] = None) -> List[Tuple]:
+    def add_messages(self, messages: List[Dict]) -> bool:
+        """
+        Add several messages in a single transaction.
+        
+        Args:
+            messages: Message dictionaries with role, content and optional
+                username, metadata, conversation_id and uid keys
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        rows = [
+            self._build_row(
+                m["role"], m["content"], m.get("username"), m.get("metadata"), m.get("conversation_id"), m.get("uid")
+            )
+            for m in messages
+        ]
+        self.flush()
+        return self.insert_rows(rows)
+    
+    def insert_rows(self, rows: List[Tuple], synchronous: Optional[str] = None, skip_invalid: bool = False) -> bool:
+        """
+        Insert prepared rows with executemany inside one transaction.
+        
+        Args:
+            rows: Row tuples as built by _build_row
+            synchronous: Optional SQLite synchronous level for this commit only
+            skip_invalid: Insert the rows one at a time, dropping (and logging)
+                each row that violates a constraint instead of failing them all
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not rows:
+            return True
+        try:
+            with self._get_connection() as conn, metrics.timer("db_insert_rows_seconds"):
+                if synchronous and synchronous != self.config.synchronous:
+                    conn.execute(f"PRAGMA synchronous = {synchronous}")
+                dropped = 0
+                try:
+                    with conn:
+                        if skip_invalid:
+                            for row in rows:
+                                # A constraint error only undoes its own statement, not the transaction
+                                try:
+                                    conn.execute(self._insert_sql(), row)
+                                except sqlite3.IntegrityError as e:
+                                    dropped += 1
+                                    print(f"Error: dropped message {row[6]} of conversation {row[5]}: {e}")
+                        else:
+                            conn.executemany(self._insert_sql(), rows)
+                finally:
+                    if synchronous and synchronous != self.config.synchronous:
+                        conn.execute(f"PRAGMA synchronous = {self.config.synchronous}")
+                metrics.increment("db_rows_inserted_total", len(rows) - dropped)
+                if dropped:
+                    metrics.increment("db_rows_dropped_total", dropped)
+                return True
+        except Exception as e:
+            print(f"Error adding messages: {e}")
+            return False
+    
+    def _insert_sql(self) -> str:
+        """Return the INSERT statement matching the rows from _build_row."""
+        # Rows whose uid is already stored are skipped rather than duplicated;
+        # unlike OR IGNORE, any other constraint violation still raises
+        return (
+            f"INSERT INTO {self.table_name} "
+            "(created_at, role, username, content, metadata, conversation_id, uid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(uid) WHERE uid IS NOT NULL DO NOTHING"
+        )
+    
+    @staticmethod
+    def new_uid() -> str:
+        """Return a new unique message ID for add_message."""
+        return uuid.uuid4().hex
+    
+    def _build_row(
+        self,
+        role: str,
+        content: str,
+        username: Optional[str],
+        metadata: Optional[Dict],
+        conversation_id: Optional[int] = None,
+        uid: Optional[str] = None
+    ) -> Tuple:
+        """Build an insert row, stamping it with the current time."""
+        return (
+            datetime.datetime.now().isoformat(),
+            role,
+            username,
+            content,
+            json.dumps(metadata, ensure_ascii=False, default=str) if metadata else None,
+            conversation_id,
+            uid or self.new_uid()
+        )
+    
+    def get_messages(
+        self,
+        limit: Optional[int] = None,
+        role: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        conversation_id: Optional[int] = None
+    ) -> List[Tuple]:
         """
         Retrieve messages from the database.
         
         Args:
             limit: Optional limit on number of messages to retrieve
             role: Optional filter by role
+            columns: Optional list of columns to return (defaults to all)
+            conversation_id: Optional filter by conversation
         
         Returns:
             List of message tuples
         """
+        select = self._select_columns(columns)
+        self.flush()
         try:
-            with self._get_connection() as conn:
+            with self._get_connection() as conn, metrics.timer("db_query_seconds"):
                 cursor = conn.cursor()
-                query = f"SELECT * FROM {self.table_name}"
-                params = []
-                
-                if role:
-                    query += " WHERE role = ?"
-                    params.append(role)
+                query = f"SELECT {select} FROM {self.table_name}"
+                where, params = self._where(role=role, conversation_id=conversation_id)
+                query += where
                 
                 query += " ORDER BY created_at ASC"
                 
@@ -119,42 +694,208 @@ class MessageDatabase:
             print(f"Error getting messages: {e}")
             return []
     
-    def clear_messages(self) -> bool:
+    def get_messages_page(
+        self,
+        limit: int = 50,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+        role: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        conversation_id: Optional[int] = None
+    ) -> List[Tuple]:
+        """
+        Retrieve one page of messages using keyset pagination on the id.
+        
+        Without a cursor the newest page is returned. Pass the smallest id of
+        a page as before_id to fetch the page preceding it, or the largest id
+        as after_id to fetch the page following it.
+        
+        Args:
+            limit: Maximum number of messages in the page
+            before_id: Only return messages with an id lower than this
+            after_id: Only return messages with an id higher than this
+            role: Optional filter by role
+            columns: Optional list of columns to return (defaults to all)
+            conversation_id: Optional filter by conversation
+        
+        Returns:
+            List of message tuples in ascending id order
+        """
+        select = self._select_columns(columns)
+        self.flush()
+        try:
+            with self._get_connection() as conn, metrics.timer("db_page_query_seconds"):
+                cursor = conn.cursor()
+                where, params = self._where(
+                    role=role,
+                    conversation_id=conversation_id,
+                    before_id=before_id,
+                    after_id=after_id
+                )
+                query = f"SELECT {select} FROM {self.table_name}" + where
+                
+                # Walk the primary key from the cursor outwards, newest page first by default
+                descending = after_id is None
+                query += " ORDER BY id DESC" if descending else " ORDER BY id ASC"
+                query += " LIMIT ?"
+                params.append(limit)
+                
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                return rows[::-1] if descending else rows
+        except Exception as e:
+            print(f"Error getting messages page: {e}")
+            return []
+    
+    def iter_messages(
+        self,
+        chunk_size: int = 1000,
+        columns: Optional[List[str]] = None,
+        conversation_id: Optional[int] = None
+    ) -> Iterator[List[Tuple]]:
+        """
+        Iterate over messages in id order, one chunk at a time.
+        
+        Each chunk is fetched with keyset pagination, so memory use depends
+        on chunk_size rather than on the size of the history.
+        
+        Args:
+            chunk_size: Number of messages per chunk
+            columns: Optional list of columns to return; must include "id"
+            conversation_id: Optional filter by conversation
+        
+        Yields:
+            List of message tuples
+        """
+        columns = list(columns or MESSAGE_COLUMNS)
+        if "id" not in columns:
+            raise ValueError("iter_messages needs the id column to page through messages")
+        id_index = columns.index("id")
+        
+        last_id = 0
+        while True:
+            rows = self.get_messages_page(
+                limit=chunk_size,
+                after_id=last_id,
+                columns=columns,
+                conversation_id=conversation_id
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][id_index]
+    
+    def get_messages_by_ids(self, message_ids: List[int], columns: Optional[List[str]] = None) -> List[Tuple]:
         """
-        Clear all messages from the database.
+        Retrieve specific messages.
+        
+        Args:
+            message_ids: IDs of the messages to fetch
+            columns: Optional list of columns to return (defaults to all)
+        
+        Returns:
+            List of message tuples in the order of message_ids; missing
+            (deleted) messages are left out
+        """
+        if not message_ids:
+            return []
+        columns = list(columns or MESSAGE_COLUMNS)
+        select = self._select_columns(["id"] + columns)
+        # No flush: a message only has an id once it is written
+        try:
+            with self._get_connection() as conn, metrics.timer("db_query_seconds"):
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" for _ in message_ids)
+                cursor.execute(f"SELECT {select} FROM {self.table_name} WHERE id IN ({placeholders})", list(message_ids))
+                rows = {row[0]: row[1:] for row in cursor.fetchall()}
+                return [rows[message_id] for message_id in message_ids if message_id in rows]
+        except Exception as e:
+            print(f"Error getting messages: {e}")
+            return []
+    
+    def _where(
+        self,
+        role: Optional[str] = None,
+        conversation_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None
+    ) -> Tuple[str, List]:
+        """Build a WHERE clause and its parameters from the common message filters."""
+        conditions = []
+        params = []
+        
+        if conversation_id is not None:
+            conditions.append("conversation_id = ?")
+            params.append(conversation_id)
+        if role:
+            conditions.append("role = ?")
+            params.append(role)
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if after_id is not None:
+            conditions.append("id > ?")
+            params.append(after_id)
+        
+        if not conditions:
+            return "", params
+        return " WHERE " + " AND ".join(conditions), params
+    
+    def _select_columns(self, columns: Optional[List[str]]) -> str:
+        """Validate requested columns and build the SELECT list."""
+        if not columns:
+            return ", ".join(MESSAGE_COLUMNS)
+        unknown = [column for column in columns if column not in MESSAGE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown message columns: {', '.join(unknown)}")
+        return ", ".join(columns)
+    
+    def clear_messages(self, conversation_id: Optional[int] = None) -> bool:
+        """
+        Clear messages from the database.
+        
+        Args:
+            conversation_id: Only clear this conversation (defaults to all messages)
         
         Returns:
             bool: True if successful, False otherwise
         """
+        self.flush()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(f"DELETE FROM {self.table_name}")
+                where, params = self._where(conversation_id=conversation_id)
+                cursor.execute(f"DELETE FROM {self.table_name}" + where, params)
+                # A summary of deleted messages would resurface when the conversation is reopened
+                if conversation_id is None:
+                    cursor.execute(f"DELETE FROM {self.summaries_table}")
+                else:
+                    cursor.execute(f"DELETE FROM {self.summaries_table} WHERE conversation_id = ?", (conversation_id,))
                 conn.commit()
                 return True
         except Exception as e:
             print(f"Error clearing messages: {e}")
             return False
     
-    def get_message_count(self, role: Optional[str] = None) -> int:
+    def get_message_count(self, role: Optional[str] = None, conversation_id: Optional[int] = None) -> int:
         """
         Get the total number of messages.
         
         Args:
             role: Optional filter by role
+            conversation_id: Optional filter by conversation
         
         Returns:
             int: Number of messages
         """
+        self.flush()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                query = f"SELECT COUNT(*) FROM {self.table_name}"
-                params = []
-                
-                if role:
-                    query += " WHERE role = ?"
-                    params.append(role)
+                where, params = self._where(role=role, conversation_id=conversation_id)
+                query = f"SELECT COUNT(*) FROM {self.table_name}" + where
                 
                 cursor.execute(query, params)
                 return cursor.fetchone()[0]
@@ -172,6 +913,7 @@ class MessageDatabase:
         Returns:
             bool: True if successful, False otherwise
         """
+        self.flush()
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
@@ -181,3 +923,330 @@ class MessageDatabase:
         except Exception as e:
             print(f"Error deleting message: {e}")
             return False
+    
+    def create_conversation(self, title: Optional[str] = None) -> Optional[int]:
+        """
+        Start a new conversation.
+        
+        Args:
+            title: Optional human readable title
+        
+        Returns:
+            The new conversation ID, or None on failure
+        """
+        now = datetime.datetime.now().isoformat()
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"INSERT INTO {self.conversations_table} (title, created_at, updated_at) VALUES (?, ?, ?)",
+                    (title, now, now)
+                )
+                conn.commit()
+                return cursor.lastrowid
+        except Exception as e:
+            print(f"Error creating conversation: {e}")
+            return None
+    
+    def get_summary(self, conversation_id: int) -> Optional[Tuple[str, int]]:
+        """
+        Retrieve the rolling summary of a conversation.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            Tuple of (summary, last_message_id), or None if there is no summary;
+            messages with an id above last_message_id are not covered by it
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT summary, last_message_id FROM {self.summaries_table} WHERE conversation_id = ?",
+                    (conversation_id,)
+                )
+                return cursor.fetchone()
+        except Exception as e:
+            print(f"Error getting summary: {e}")
+            return None
+    
+    def save_summary(self, conversation_id: int, summary: str, message_count: int) -> bool:
+        """
+        Store the rolling summary of a conversation, replacing the previous one.
+        
+        Args:
+            conversation_id: The ID of the conversation
+            summary: The summary text
+            message_count: Number of the conversation's messages, oldest first,
+                the summary covers
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if message_count <= 0:
+            return False
+        # The covered messages may still be queued in the writer
+        self.flush()
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT id FROM {self.table_name} WHERE conversation_id = ? ORDER BY id LIMIT 1 OFFSET ?",
+                    (conversation_id, message_count - 1)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    return False
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO {self.summaries_table} "
+                    "(conversation_id, summary, last_message_id, updated_at) VALUES (?, ?, ?, ?)",
+                    (conversation_id, summary, row[0], datetime.datetime.now().isoformat())
+                )
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Error saving summary: {e}")
+            return False
+    
+    def list_conversations(self, limit: Optional[int] = None) -> List[Tuple]:
+        """
+        List conversations, most recently active first.
+        
+        Args:
+            limit: Optional limit on number of conversations to retrieve
+        
+        Returns:
+            List of (id, title, created_at, updated_at) tuples
+        """
+        self.flush()
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                query = f"SELECT id, title, created_at, updated_at FROM {self.conversations_table} ORDER BY updated_at DESC"
+                params = []
+                
+                if limit:
+                    query += " LIMIT ?"
+                    params.append(limit)
+                
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        except Exception as e:
+            print(f"Error listing conversations: {e}")
+            return []
+    
+    def get_conversation(self, conversation_id: int) -> Optional[Tuple]:
+        """
+        Get a single conversation.
+        
+        Args:
+            conversation_id: The ID of the conversation
+        
+        Returns:
+            An (id, title, created_at, updated_at) tuple, or None if not found
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT id, title, created_at, updated_at FROM {self.conversations_table} WHERE id = ?",
+                    (conversation_id,)
+                )
+                return cursor.fetchone()
+        except Exception as e:
+            print(f"Error getting conversation: {e}")
+            return None
+    
+    def import_conversations(self, conversations: List[Dict]) -> int:
+        """
+        Store several complete conversations in a single transaction.
+        
+        Conversations whose content_hash is already stored are skipped, so
+        importing the same source twice is harmless.
+        
+        Args:
+            conversations: Dictionaries with title, created_at, source,
+                content_hash and a messages list of role/content dictionaries
+        
+        Returns:
+            int: Number of conversations stored, or -1 on failure
+        """
+        self.flush()
+        try:
+            with self._get_connection() as conn:
+                imported = 0
+                with conn:
+                    cursor = conn.cursor()
+                    for conversation in conversations:
+                        created_at = conversation["created_at"]
+                        cursor.execute(
+                            f"INSERT INTO {self.conversations_table} "
+                            "(title, created_at, updated_at, source, content_hash) VALUES (?, ?, ?, ?, ?) "
+                            "ON CONFLICT(content_hash) WHERE content_hash IS NOT NULL DO NOTHING",
+                            (
+                                conversation.get("title"),
+                                created_at,
+                                created_at,
+                                conversation.get("source"),
+                                conversation.get("content_hash")
+                            )
+                        )
+                        if cursor.rowcount == 0:
+                            continue
+                        conversation_id = cursor.lastrowid
+                        # Message uids derive from the source, so they stay stable across imports
+                        source_key = conversation.get("content_hash")
+                        cursor.executemany(self._insert_sql(), [
+                            (
+                                created_at, m["role"], None, m["content"], None, conversation_id,
+                                f"{source_key}:{index}" if source_key else self.new_uid()
+                            )
+                            for index, m in enumerate(conversation["messages"])
+                        ])
+                        imported += 1
+                return imported
+        except Exception as e:
+            print(f"Error importing conversations: {e}")
+            return -1
+    
+    def get_content_hashes(self) -> set:
+        """
+        Get the content hashes of all imported conversations.
+        
+        Returns:
+            set: Stored content hashes
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT content_hash FROM {self.conversations_table} WHERE content_hash IS NOT NULL")
+                return {row[0] for row in cursor}
+        except Exception as e:
+            print(f"Error getting content hashes: {e}")
+            return set()
+    
+    def delete_conversation(self, conversation_id: int) -> bool:
+        """
+        Delete a conversation together with all of its messages.
+        
+        Args:
+            conversation_id: The ID of the conversation to delete
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.flush()
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f"DELETE FROM {self.table_name} WHERE conversation_id = ?", (conversation_id,))
+                cursor.execute(f"DELETE FROM {self.summaries_table} WHERE conversation_id = ?", (conversation_id,))
+                cursor.execute(f"DELETE FROM {self.conversations_table} WHERE id = ?", (conversation_id,))
+                conn.commit()
+                return cursor.rowcount > 0
+        except Exception as e:
+            print(f"Error deleting conversation: {e}")
+            return False
+    
+    def search(self, query: str, limit: int = 20, conversation: Optional[int] = None) -> List[Tuple]:
+        """
+        Full-text search over message content, best matches first.
+        
+        Args:
+            query: Words to search for; every word must match
+            limit: Maximum number of results
+            conversation: Optional conversation ID to restrict the search to
+        
+        Returns:
+            List of (id, conversation_id, role, created_at, snippet) tuples
+        """
+        match = self._fts_query(query)
+        if not self.fts_enabled or not match:
+            return []
+        
+        self.flush()
+        try:
+            with self._get_connection() as conn, metrics.timer("db_search_seconds"):
+                cursor = conn.cursor()
+                sql = f'''
+                    SELECT m.id, m.conversation_id, m.role, m.created_at,
+                           snippet({self.fts_table}, 0, '[', ']', '...', 12)
+                    FROM {self.fts_table}
+                    JOIN {self.table_name} AS m ON m.id = {self.fts_table}.rowid
+                    WHERE {self.fts_table} MATCH ?
+                '''
+                params = [match]
+                
+                if conversation is not None:
+                    sql += " AND m.conversation_id = ?"
+                    params.append(conversation)
+                
+                sql += " ORDER BY rank LIMIT ?"
+                params.append(limit)
+                
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+        except Exception as e:
+            print(f"Error searching messages: {e}")
+            return []
+    
+    def get_usage_stats(
+        self,
+        conversation_id: Optional[int] = None,
+        since: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Aggregate token usage and latency of assistant responses per model.
+        
+        Args:
+            conversation_id: Optional filter by conversation
+            since: Optional ISO timestamp; only responses created at or after it count
+        
+        Returns:
+            List of dicts with model, responses, cached, prompt_tokens,
+            completion_tokens, total_tokens, avg_latency_ms, max_latency_ms
+            and avg_ttft_ms
+        """
+        self.flush()
+        try:
+            with self._get_connection() as conn:
+                sql = f'''
+                    SELECT json_extract(metadata, '$.model') AS model,
+                           COUNT(*),
+                           SUM(coalesce(json_extract(metadata, '$.cached'), 0)),
+                           coalesce(SUM(json_extract(metadata, '$.prompt_tokens')), 0),
+                           coalesce(SUM(json_extract(metadata, '$.completion_tokens')), 0),
+                           coalesce(SUM(json_extract(metadata, '$.total_tokens')), 0),
+                           AVG(json_extract(metadata, '$.latency_ms')),
+                           MAX(json_extract(metadata, '$.latency_ms')),
+                           AVG(json_extract(metadata, '$.ttft_ms'))
+                    FROM {self.table_name}
+                    WHERE role = 'assistant' AND metadata IS NOT NULL
+                '''
+                params = []
+                
+                if conversation_id is not None:
+                    sql += " AND conversation_id = ?"
+                    params.append(conversation_id)
+                
+                if since is not None:
+                    sql += " AND created_at >= ?"
+                    params.append(since)
+                
+                sql += " GROUP BY model ORDER BY model"
+                
+                keys = (
+                    "model", "responses", "cached", "prompt_tokens", "completion_tokens",
+                    "total_tokens", "avg_latency_ms", "max_latency_ms", "avg_ttft_ms"
+                )
+                return [dict(zip(keys, row)) for row in conn.execute(sql, params)]
+        except Exception as e:
+            print(f"Error getting usage stats: {e}")
+            return []
+    
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Quote each word so user input is never parsed as FTS5 syntax."""
+        terms = query.split()
+        return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
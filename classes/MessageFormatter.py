@@ -0,0 +1,161 @@
+import hashlib
+import html
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+from .Metrics import metrics
+
+CODE_BLOCK_STYLE = "background-color: #1E1E1E; padding: 10px; border-radius: 5px; font-family: monospace;"
+INLINE_CODE_STYLE = "background-color: #1E1E1E; font-family: monospace;"
+
+FENCE = re.compile(r"^\s*```")
+UNORDERED_ITEM = re.compile(r"^\s*[-*+]\s+(.*)$")
+ORDERED_ITEM = re.compile(r"^\s*\d+[.)]\s+(.*)$")
+INLINE_CODE = re.compile(r"`([^`]+)`")
+
+class MessageFormatter:
+    """Renders message Markdown to HTML in one pass, caching the result per message."""
+    def __init__(self, templates: Optional[Dict[str, str]] = None, cache_size: int = 2048):
+        """
+        Initialize the formatter.
+
+        Args:
+            templates: Optional HTML templates per role with %time% and
+                %content% placeholders (e.g. STYLES["message_styles"])
+            cache_size: Number of rendered message bodies to keep
+        """
+        self.templates = templates or {}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Union[int, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def format(self, role: str, content: str, timestamp: str, message_id: Optional[int] = None) -> str:
+        """
+        Render a message, wrapped in its role's template.
+
+        Args:
+            role: The role of the message sender
+            content: The message content (Markdown)
+            timestamp: Timestamp shown in the template
+            message_id: Optional stored message ID used as the cache key
+
+        Returns:
+            str: The message HTML
+        """
+        body = self.render(content, message_id)
+        template = self.templates.get(role)
+        if template is None:
+            return body
+        return template.replace("%time%", timestamp).replace("%content%", body)
+
+    def render(self, content: str, message_id: Optional[int] = None) -> str:
+        """
+        Render Markdown content to HTML, reusing a cached result when possible.
+
+        Args:
+            content: The Markdown text
+            message_id: Optional stored message ID used as the cache key
+
+        Returns:
+            str: The rendered HTML body
+        """
+        key = message_id if message_id is not None else hashlib.sha1(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                metrics.increment("format_cache_hits_total")
+                return cached
+
+        with metrics.timer("format_render_seconds"):
+            body = self.to_html(content)
+        with self._lock:
+            self._cache[key] = body
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body
+
+    @staticmethod
+    def to_html(content: str) -> str:
+        """
+        Convert Markdown to HTML in a single pass over the lines.
+
+        Supports fenced code blocks, inline code and ordered/unordered lists.
+        Other text is escaped and its line breaks are preserved.
+
+        Args:
+            content: The Markdown text
+
+        Returns:
+            str: The HTML
+        """
+        out: List[str] = []
+        code: Optional[List[str]] = None
+        list_tag: Optional[str] = None
+        paragraph: List[str] = []
+
+        def inline(text: str) -> str:
+            return INLINE_CODE.sub(
+                lambda m: f'<code style="{INLINE_CODE_STYLE}">{m.group(1)}</code>',
+                html.escape(text, quote=False)
+            )
+
+        def close_paragraph():
+            # Blank lines inside a run of text become extra line breaks
+            while paragraph and not paragraph[-1]:
+                paragraph.pop()
+            if paragraph:
+                out.append("<br>".join(paragraph))
+            paragraph.clear()
+
+        def code_block(lines: List[str]) -> str:
+            text = html.escape("\n".join(lines).strip("\n"), quote=False)
+            return f'<pre style="{CODE_BLOCK_STYLE}">{text}</pre>'
+
+        def close_list():
+            nonlocal list_tag
+            if list_tag:
+                out.append(f"</{list_tag}>")
+                list_tag = None
+
+        for line in content.split("\n"):
+            if code is not None:
+                if FENCE.match(line):
+                    out.append(code_block(code))
+                    code = None
+                else:
+                    code.append(line)
+                continue
+
+            if FENCE.match(line):
+                close_paragraph()
+                close_list()
+                # The fence line's language tag is not part of the code
+                code = []
+                continue
+
+            item = UNORDERED_ITEM.match(line)
+            tag = "ul"
+            if item is None:
+                item = ORDERED_ITEM.match(line)
+                tag = "ol"
+            if item is not None:
+                close_paragraph()
+                if list_tag != tag:
+                    close_list()
+                    out.append(f"<{tag}>")
+                    list_tag = tag
+                out.append(f"<li>{inline(item.group(1))}</li>")
+                continue
+
+            close_list()
+            if line.strip() or paragraph:
+                paragraph.append(inline(line) if line.strip() else "")
+
+        # An unterminated fence (e.g. a response still streaming) is still shown as code
+        if code is not None:
+            out.append(code_block(code))
+        close_paragraph()
+        close_list()
+        return "".join(out)
@@ -0,0 +1,202 @@
+import atexit
+import queue
+import threading
+from typing import List, Tuple, Optional
+
+# Maps the durability knob onto SQLite's synchronous levels
+DURABILITY_LEVELS = {
+    "off": "OFF",
+    "normal": "NORMAL",
+    "full": "FULL",
+}
+
+# Queued by close() to wake the background thread
+_STOP = object()
+
+class MessageWriter:
+    """Write-behind queue: callers enqueue rows, a background thread commits them in batches."""
+    def __init__(
+        self,
+        message_db,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+        durability: str = "normal",
+        max_pending: int = 10000
+    ):
+        """
+        Initialize the writer and start its background thread.
+
+        Args:
+            message_db: The MessageDatabase rows are written into
+            batch_size: Maximum number of rows committed per transaction
+            flush_interval: Seconds to wait before retrying a failed write
+            durability: One of "off", "normal" or "full"; the SQLite
+                synchronous level used while committing a batch
+            max_pending: Maximum number of queued rows; add() blocks while
+                the queue is full, so a stalled disk slows callers down
+                instead of growing memory without bound
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {durability}")
+
+        self.message_db = message_db
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(max_pending, 1))
+        # Rows taken off the queue but not yet committed
+        self._batch: List[Tuple] = []
+        # Enqueue order must match the counter so flush() knows what to wait for
+        self._put_lock = threading.Lock()
+        self._remaining_lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._enqueued = 0
+        self._committed = 0
+        self._failures = 0
+        self._stopping = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="MessageWriter", daemon=True)
+        self._thread.start()
+        # Queued rows must reach the database even if close() is never called
+        atexit.register(self.close)
+
+    def add(self, row: Tuple) -> bool:
+        """
+        Queue a single message row for writing.
+
+        Blocks while max_pending rows are already waiting. After close()
+        the row is written synchronously instead.
+
+        Args:
+            row: A row tuple as built by MessageDatabase
+
+        Returns:
+            bool: True once the row is queued (or written), False if a
+            synchronous write after close() failed
+        """
+        synchronous = DURABILITY_LEVELS[self.durability]
+        with self._put_lock:
+            # Checked under the lock: close() drains the queue while holding it
+            if self._closed:
+                return self.message_db.insert_rows([row], synchronous=synchronous)
+            while True:
+                try:
+                    self._queue.put(row, timeout=0.1)
+                    break
+                except queue.Full:
+                    # Once the thread has stopped nothing drains a full queue
+                    if not self._thread.is_alive():
+                        # Write the queued rows first so rows keep their order
+                        if not self._write_remaining():
+                            return False
+                        return self.message_db.insert_rows([row], synchronous=synchronous)
+            with self._progress:
+                self._enqueued += 1
+        return True
+
+    def pending(self) -> int:
+        """Return the number of queued rows not yet committed."""
+        with self._progress:
+            return self._enqueued - self._committed
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every row queued before this call is committed.
+
+        Args:
+            timeout: Optional maximum number of seconds to wait
+
+        Returns:
+            bool: True if the rows were written, False if a write failed
+            (the rows stay queued for a retry) or the timeout expired
+        """
+        if self._closed or not self._thread.is_alive():
+            return self._write_remaining()
+
+        with self._progress:
+            target = self._enqueued
+            failures = self._failures
+            self._progress.wait_for(
+                lambda: self._committed >= target or self._failures != failures,
+                timeout
+            )
+            return self._committed >= target
+
+    def _run(self) -> None:
+        """Drain the queue, committing whatever has accumulated as one batch."""
+        while True:
+            item = self._queue.get()
+            stop = item is _STOP
+            if not stop:
+                self._batch.append(item)
+            # Group commit: rows that queued up meanwhile share the transaction
+            while not stop and len(self._batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    self._batch.append(item)
+
+            # On failure keep the batch and retry it before taking new rows;
+            # the bounded queue then pushes back on callers
+            while not self._write_batch():
+                if self._stopping.wait(self.flush_interval):
+                    # close() makes the final attempt
+                    return
+            if stop:
+                return
+
+    def _write_batch(self) -> bool:
+        """Commit the current batch, keeping it for a retry if the write fails."""
+        if not self._batch:
+            return True
+        synchronous = DURABILITY_LEVELS[self.durability]
+        ok = self.message_db.insert_rows(self._batch, synchronous=synchronous)
+        if not ok:
+            # One bad row (e.g. its conversation was deleted) must not hold up the
+            # rows behind it forever: retry one by one, dropping rows that cannot be stored
+            ok = self.message_db.insert_rows(self._batch, synchronous=synchronous, skip_invalid=True)
+        with self._progress:
+            if ok:
+                self._committed += len(self._batch)
+                self._batch = []
+            else:
+                self._failures += 1
+            self._progress.notify_all()
+        return ok
+
+    def _write_remaining(self) -> bool:
+        """Synchronously write rows left over once the background thread has stopped."""
+        with self._remaining_lock:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    self._batch.append(item)
+            return self._write_batch()
+
+    def close(self) -> None:
+        """Commit every queued row and stop the background thread."""
+        if self._closed:
+            return
+        atexit.unregister(self.close)
+        self._stopping.set()
+        while self._thread.is_alive():
+            # The thread may already have given up on a failing database with the queue full
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+        # Rows queued before this point are drained; later ones are written by add() itself
+        with self._put_lock:
+            self._closed = True
+            written = self._write_remaining()
+        if not written:
+            print(f"Error: {self.pending()} messages could not be written to the database")
@@ -0,0 +1,243 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Counter:
+    """A monotonically increasing count."""
+    def __init__(self, name: str, help_text: str = ""):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def increment(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Tracks count, sum and quantiles over a window of the most recent observations."""
+    def __init__(self, name: str, help_text: str = "", window: int = 4096):
+        """
+        Initialize the histogram.
+
+        Args:
+            name: Metric name
+            help_text: Description shown in the Prometheus output
+            window: Number of recent observations quantiles are computed from
+        """
+        self.name = name
+        self.help_text = help_text
+        self.count = 0
+        self.sum = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self._samples.append(value)
+
+    def quantiles(self, quantiles=QUANTILES) -> Dict[float, float]:
+        """
+        Compute quantiles (nearest rank) over the recent observations.
+
+        Returns:
+            dict: Quantile to value, NaN when nothing was observed yet
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {q: math.nan for q in quantiles}
+        return {q: samples[max(math.ceil(q * len(samples)) - 1, 0)] for q in quantiles}
+
+class MetricsRegistry:
+    """Holds named counters and histograms and exports them."""
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry.
+
+        Args:
+            enabled: When False, observations are dropped (timers still run their block)
+        """
+        self.enabled = enabled
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._hooks: List[Callable[[str, float], None]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """Return the counter with this name, creating it on first use."""
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(name, help_text))
+        return counter
+
+    def histogram(self, name: str, help_text: str = "") -> Histogram:
+        """Return the histogram with this name, creating it on first use."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(name, help_text))
+        return histogram
+
+    def add_hook(self, hook: Callable[[str, float], None]) -> None:
+        """
+        Register a callable receiving every (name, value) observation and increment.
+
+        Useful to forward metrics to another system (statsd, a log, a test).
+        """
+        self._hooks.append(hook)
+
+    def increment(self, name: str, amount: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        self.counter(name).increment(amount)
+        for hook in self._hooks:
+            hook(name, amount)
+
+    def observe(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        self.histogram(name).observe(value)
+        for hook in self._hooks:
+            hook(name, value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """
+        Time a block and record its duration in seconds, even if it raises.
+
+        Example:
+            with metrics.timer("db_query_seconds"):
+                ...
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def _items(self):
+        # Copied under the lock: other threads may register metrics while exporting
+        with self._lock:
+            return sorted(self._counters.items()), sorted(self._histograms.items())
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Return the current values of every metric.
+
+        Returns:
+            dict: Counter values and histogram count/sum/p50/p95/p99 keyed by name
+        """
+        result = {}
+        counters, histograms = self._items()
+        for name, counter in counters:
+            result[name] = {"value": counter.value}
+        for name, histogram in histograms:
+            quantiles = histogram.quantiles()
+            result[name] = {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                **{f"p{round(q * 100)}": value for q, value in quantiles.items()},
+            }
+        return result
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        counters, histograms = self._items()
+        for name, counter in counters:
+            if counter.help_text:
+                lines.append(f"# HELP {name} {counter.help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counter.value}")
+        for name, histogram in histograms:
+            if histogram.help_text:
+                lines.append(f"# HELP {name} {histogram.help_text}")
+            # Quantiles over a sliding window are what Prometheus calls a summary
+            lines.append(f"# TYPE {name} summary")
+            for q, value in histogram.quantiles().items():
+                lines.append(f'{name}{{quantile="{q}"}} {value}')
+            lines.append(f"{name}_sum {histogram.sum}")
+            lines.append(f"{name}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self) -> str:
+        """Return a compact one-line-per-metric summary for logs."""
+        lines = []
+        for name, values in self.snapshot().items():
+            if "value" in values:
+                lines.append(f"{name}: {values['value']:g}")
+            else:
+                lines.append(
+                    f"{name}: n={values['count']} p50={values['p50'] * 1000:.1f}ms "
+                    f"p95={values['p95'] * 1000:.1f}ms p99={values['p99'] * 1000:.1f}ms"
+                )
+        return "\n".join(lines)
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1"):
+        """
+        Serve the Prometheus text format on http://host:port/metrics from a daemon thread.
+
+        Args:
+            port: Port to listen on
+            host: Interface to bind; local only by default
+
+        Returns:
+            The running server; call shutdown() to stop it
+        """
+        # Imported here: every module records metrics, few processes serve them
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+        return server
+
+    def start_logging(self, interval: float = 60.0, log: Callable[[str], None] = print) -> threading.Event:
+        """
+        Log a summary of all metrics every interval seconds from a daemon thread.
+
+        Args:
+            interval: Seconds between summaries
+            log: Callable receiving the summary text
+
+        Returns:
+            threading.Event: Set it to stop logging
+        """
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                summary = self.format_summary()
+                if summary:
+                    log(summary)
+
+        threading.Thread(target=run, name="MetricsLogger", daemon=True).start()
+        return stop
+
+# Process-wide registry used by ChatBot, MessageDatabase and the window
+metrics = MetricsRegistry()
@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at a fixed rate."""
+    def __init__(self, capacity: float, per_seconds: float = 60.0):
+        """
+        Args:
+            capacity: Maximum burst size (and amount refilled per period)
+            per_seconds: Length of the refill period in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 if it is available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+class RequestScheduler:
+    """Rate-limits, fairly orders and retries API requests across conversations."""
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request rate limit (None for unlimited)
+            tokens_per_minute: Token rate limit (None for unlimited)
+            max_retries: Retries after the first attempt for retryable errors
+            base_delay: Initial backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay
+        """
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._queues: Dict[Hashable, Deque[object]] = {}
+        self._rotation: Deque[Hashable] = deque()
+        self._paused_until = 0.0
+
+    def execute(self, key: Hashable, func: Callable[[], T], tokens: int = 0) -> T:
+        """
+        Run a request once its turn comes, retrying transient failures.
+
+        Args:
+            key: Fairness key, usually the conversation ID
+            func: Callable performing the request
+            tokens: Estimated tokens the request consumes
+
+        Returns:
+            Whatever func returns
+
+        Raises:
+            The last error once retries are exhausted, or any non-retryable error
+        """
+        attempt = 0
+        while True:
+            self.acquire(key, tokens)
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                retry_after = self.retry_after(e)
+                if retry_after is not None:
+                    # The server told us when to come back; hold every caller until then
+                    self.pause(retry_after)
+                    delay = retry_after
+                else:
+                    delay = self.backoff(attempt)
+                attempt += 1
+                time.sleep(delay)
+
+    def acquire(self, key: Hashable, tokens: int = 0) -> None:
+        """
+        Block until the caller may send a request.
+
+        Waiting callers are served round-robin by key, so a conversation
+        with many queued requests cannot starve the others.
+
+        Args:
+            key: Fairness key, usually the conversation ID
+            tokens: Estimated tokens the request consumes
+        """
+        ticket = object()
+        with self._cond:
+            if key not in self._queues:
+                self._queues[key] = deque()
+                self._rotation.append(key)
+            self._queues[key].append(ticket)
+
+            while True:
+                head = self._rotation[0]
+                if self._queues[head][0] is ticket:
+                    wait = self._reserve(tokens)
+                    if wait == 0:
+                        self._queues[key].popleft()
+                        self._rotation.popleft()
+                        if self._queues[key]:
+                            self._rotation.append(key)
+                        else:
+                            del self._queues[key]
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _reserve(self, tokens: int) -> float:
+        """Take capacity from both buckets, or return how long to wait for it."""
+        now = time.monotonic()
+        wait = max(self._paused_until - now, 0.0)
+        if self.request_bucket is not None:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket is not None and tokens:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+
+        if self.request_bucket is not None:
+            self.request_bucket.consume(1)
+        if self.token_bucket is not None and tokens:
+            self.token_bucket.consume(tokens)
+        return 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Hold all requests for the given number of seconds."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """Whether an API error is transient and worth retrying."""
+        # Imported here so the scheduler itself does not load the SDK
+        import openai
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+            return True
+        status = getattr(error, "status_code", None)
+        return status is not None and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+    def retry_after(self, error: Exception) -> Optional[float]:
+        """Read the server's Retry-After hint from an API error, in seconds."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+            value = headers.get(header)
+            if value is None:
+                continue
+            try:
+                return min(float(value) * scale, self.max_delay)
+            except ValueError:
+                # HTTP-date form is not worth parsing; fall back to backoff
+                continue
+        return None
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .MessageDatabase import ConnectionPool, DatabaseConfig
+
+# Request parameters that change the completion and so belong in the key
+KEY_FIELDS = ("model", "messages", "temperature", "max_tokens", "presence_penalty", "frequency_penalty")
+
+class ResponseCache:
+    """Two-level (in-memory LRU + SQLite) cache of chat completion responses."""
+    def __init__(
+        self,
+        db_path: str = 'llmdb.db',
+        ttl_seconds: Optional[float] = 86400,
+        max_memory_entries: int = 256,
+        max_db_entries: int = 10000
+    ):
+        """
+        Initialize the response cache.
+
+        Args:
+            db_path: SQLite database the cache table lives in
+            ttl_seconds: Seconds an entry stays valid (None never expires)
+            max_memory_entries: Size of the in-memory LRU layer
+            max_db_entries: Entries kept on disk before the least recently used are evicted
+        """
+        self.table_name = "response_cache"
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_db_entries = max_db_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ConnectionPool(db_path, DatabaseConfig(pool_size=2))
+        self._writes_since_evict = 0
+        self._ensure_table_exists()
+
+    def _ensure_table_exists(self) -> None:
+        """Ensures the cache table and its eviction index exist."""
+        with self._pool.connection() as conn:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_name}_last_used ON {self.table_name} (last_used)")
+            conn.commit()
+
+    @staticmethod
+    def make_key(params: Dict) -> str:
+        """
+        Build a stable cache key from chat completion request parameters.
+
+        Args:
+            params: The keyword arguments passed to chat.completions.create
+
+        Returns:
+            str: A SHA-256 hex digest
+        """
+        payload = {field: params.get(field) for field in KEY_FIELDS}
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: A key from make_key
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+        try:
+            with self._pool.connection() as conn:
+                row = conn.execute(
+                    f"SELECT response, created_at FROM {self.table_name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if self._expired(row[1], now):
+                    conn.execute(f"DELETE FROM {self.table_name} WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute(f"UPDATE {self.table_name} SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            return None
+
+        self._remember(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        """
+        Store a response.
+
+        Args:
+            key: A key from make_key
+            response: The completion text
+        """
+        now = time.time()
+        self._remember(key, response, now)
+        try:
+            with self._pool.connection() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table_name} (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                conn.commit()
+            self._writes_since_evict += 1
+            # Amortize the eviction scan over many writes
+            if self._writes_since_evict >= max(self.max_db_entries // 10, 1):
+                self.evict()
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        """Insert into the in-memory LRU layer, dropping the oldest entries."""
+        with self._lock:
+            self._memory[key] = (response, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def evict(self) -> None:
+        """Remove expired entries and trim the table to max_db_entries."""
+        self._writes_since_evict = 0
+        try:
+            with self._pool.connection() as conn:
+                if self.ttl_seconds is not None:
+                    conn.execute(
+                        f"DELETE FROM {self.table_name} WHERE created_at < ?",
+                        (time.time() - self.ttl_seconds,)
+                    )
+                conn.execute(f'''
+                    DELETE FROM {self.table_name} WHERE key IN (
+                        SELECT key FROM {self.table_name} ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                ''', (self.max_db_entries,))
+                conn.commit()
+        except Exception as e:
+            print(f"Error evicting response cache: {e}")
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._memory.clear()
+        try:
+            with self._pool.connection() as conn:
+                conn.execute(f"DELETE FROM {self.table_name}")
+                conn.commit()
+        except Exception as e:
+            print(f"Error clearing response cache: {e}")
+
+    def close(self) -> None:
+        """Close the cache's database connections."""
+        self._pool.close()
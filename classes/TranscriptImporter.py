@@ -0,0 +1,133 @@
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+from .MessageDatabase import MessageDatabase
+
+# Legacy transcripts are named messages_self_<YYYY-MM-DD>_<random>.json
+TRANSCRIPT_PATTERN = "messages_self_*.json"
+TRANSCRIPT_DATE = re.compile(r"messages_self_(\d{4}-\d{2}-\d{2})_")
+
+class TranscriptImporter:
+    """Imports the JSON transcripts written by oldcode/main.py, one conversation per file."""
+    def __init__(self, message_db: Optional[MessageDatabase] = None, batch_size: int = 500):
+        """
+        Initialize the importer.
+
+        Args:
+            message_db: Optional MessageDatabase to import into
+            batch_size: Number of files stored per transaction
+        """
+        self.message_db = message_db or MessageDatabase()
+        self.batch_size = max(batch_size, 1)
+
+    @staticmethod
+    def find_files(paths: Iterable[str]) -> Iterator[str]:
+        """
+        Expand files and directories into transcript file paths.
+
+        Args:
+            paths: Files, directories (searched for messages_self_*.json) or glob patterns
+
+        Yields:
+            str: Transcript file paths
+        """
+        for path in paths:
+            if os.path.isdir(path):
+                yield from sorted(glob.iglob(os.path.join(path, TRANSCRIPT_PATTERN)))
+            elif os.path.isfile(path):
+                yield path
+            else:
+                yield from sorted(glob.iglob(path))
+
+    @staticmethod
+    def parse_file(path: str, raw: bytes, content_hash: str) -> Optional[Dict]:
+        """
+        Turn one transcript into a conversation record for import_conversations.
+
+        Args:
+            path: Path of the transcript, used for the source and timestamp
+            raw: The file's contents
+            content_hash: SHA-256 of raw
+
+        Returns:
+            dict: The conversation record, or None if it holds no chat messages
+        """
+        # System prompts are not stored; ChatBot adds its own when a conversation is opened
+        messages = [
+            {"role": message["role"], "content": message["content"]}
+            for message in json.loads(raw)
+            if message.get("role") in ("user", "assistant") and message.get("content")
+        ]
+        if not messages:
+            return None
+
+        match = TRANSCRIPT_DATE.search(os.path.basename(path))
+        if match:
+            created_at = match.group(1) + "T00:00:00"
+        else:
+            created_at = datetime.datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+        title = next((m["content"] for m in messages if m["role"] == "user"), "")
+        return {
+            "title": title[:60].strip() or None,
+            "created_at": created_at,
+            "source": os.path.basename(path),
+            "content_hash": content_hash,
+            "messages": messages,
+        }
+
+    def import_files(self, paths: Iterable[str]) -> Dict[str, int]:
+        """
+        Import transcripts, skipping any whose content is already stored.
+
+        Args:
+            paths: Files, directories or glob patterns
+
+        Returns:
+            dict: Counts of imported, duplicate, empty and failed files
+        """
+        known = self.message_db.get_content_hashes()
+        stats = {"imported": 0, "duplicates": 0, "empty": 0, "failed": 0}
+        batch: List[Dict] = []
+
+        for path in self.find_files(paths):
+            try:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                content_hash = hashlib.sha256(raw).hexdigest()
+                if content_hash in known:
+                    stats["duplicates"] += 1
+                    continue
+                conversation = self.parse_file(path, raw, content_hash)
+            except Exception as e:
+                print(f"Error reading transcript {path}: {e}")
+                stats["failed"] += 1
+                continue
+
+            if conversation is None:
+                stats["empty"] += 1
+                continue
+
+            known.add(content_hash)
+            batch.append(conversation)
+            if len(batch) >= self.batch_size:
+                self._store(batch, stats)
+                batch = []
+
+        self._store(batch, stats)
+        return stats
+
+    def _store(self, batch: List[Dict], stats: Dict[str, int]) -> None:
+        """Write one batch of conversations in a single transaction."""
+        if not batch:
+            return
+        imported = self.message_db.import_conversations(batch)
+        if imported < 0:
+            stats["failed"] += len(batch)
+        else:
+            stats["imported"] += imported
+            stats["duplicates"] += len(batch) - imported
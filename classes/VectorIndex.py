@@ -0,0 +1,350 @@
+import json
+import os
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from .Metrics import metrics
+
+# Words and identifiers; punctuation carries little meaning for retrieval
+TOKEN_PATTERN = re.compile(r"\w+")
+
+@lru_cache(maxsize=200000)
+def _hash_feature(feature: str) -> int:
+    # crc32 rather than hash(): string hashes are salted per process
+    return zlib.crc32(feature.encode("utf-8"))
+
+class HashingEmbedder:
+    """Deterministic local embedder: hashed word and word-pair counts, no model or network needed."""
+    def __init__(self, dim: int = 256):
+        """
+        Initialize the embedder.
+
+        Args:
+            dim: Number of dimensions words are hashed into
+        """
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts as L2-normalized float32 rows.
+
+        Args:
+            texts: The texts to embed
+
+        Returns:
+            np.ndarray: Array of shape (len(texts), dim)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = TOKEN_PATTERN.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                value = _hash_feature(feature)
+                # The top bit picks the sign so collisions cancel out instead of piling up
+                vectors[row, value % self.dim] += 1.0 if value & 0x80000000 else -1.0
+        return normalize(vectors)
+
+class OpenAIEmbedder:
+    """Embeds texts with the OpenAI embeddings endpoint."""
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        dim: int = 256,
+        client=None,
+        batch_size: int = 256
+    ):
+        """
+        Initialize the embedder.
+
+        Args:
+            model: Embedding model name
+            dim: Dimensions requested from the model; fewer keep a large index small and fast
+            client: Optional OpenAI client (one is created from OPENAI_API_KEY otherwise)
+            batch_size: Texts sent per request
+        """
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+        self.batch_size = batch_size
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            # The endpoint rejects empty strings
+            batch = [text or " " for text in texts[start:start + self.batch_size]]
+            response = self.client.embeddings.create(model=self.model, input=batch, dimensions=self.dim)
+            vectors.extend(item.embedding for item in response.data)
+        return normalize(np.array(vectors, dtype=np.float32).reshape(len(texts), self.dim))
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is their cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class VectorIndex:
+    """Append-only embedding index over messages, memory-mapped from disk, with top-k cosine search."""
+    def __init__(self, path: str, embedder=None, chunk_rows: int = 65536):
+        """
+        Open or create the index.
+
+        The index is three files next to each other: path.f32 holds the
+        vectors, path.ids the message ids, and path.json the row count,
+        the last indexed message id and the embedder the vectors came from.
+
+        Args:
+            path: Base path of the index files, e.g. "llmdb.db.vectors"
+            embedder: Object with dim, name and embed(texts); defaults to HashingEmbedder
+            chunk_rows: Rows scored per step of a search, bounding its temporary memory
+
+        Raises:
+            ValueError: If the index on disk was built with a different embedder
+        """
+        self.path = path
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = self.embedder.dim
+        self.chunk_rows = chunk_rows
+        self.count = 0
+        self.last_id = 0
+        self._vectors: Optional[np.memmap] = None
+        self._ids: Optional[np.memmap] = None
+        self._mapped_count = 0
+        self._lock = threading.Lock()
+        # Concurrent syncs would index the same messages twice
+        self._sync_lock = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_requested = False
+        # Set by close() so a background sync stops before the database goes away
+        self._stop_sync = threading.Event()
+
+        if os.path.exists(self._header_path):
+            with open(self._header_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            if header["embedder"] != self.embedder.name:
+                raise ValueError(
+                    f"Index {path} was built with {header['embedder']}, not {self.embedder.name}; "
+                    "delete it or use the same embedder"
+                )
+            self.count = header["count"]
+            self.last_id = header["last_id"]
+        # Drop rows an interrupted append wrote past the recorded count
+        for file_path, row_size in ((self._vectors_path, self.dim * 4), (self._ids_path, 8)):
+            if os.path.exists(file_path) and os.path.getsize(file_path) > self.count * row_size:
+                os.truncate(file_path, self.count * row_size)
+
+    @property
+    def _vectors_path(self) -> str:
+        return f"{self.path}.f32"
+
+    @property
+    def _ids_path(self) -> str:
+        return f"{self.path}.ids"
+
+    @property
+    def _header_path(self) -> str:
+        return f"{self.path}.json"
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, message_ids: Sequence[int], texts: Sequence[str]) -> int:
+        """
+        Embed texts and append them to the index.
+
+        Args:
+            message_ids: Increasing ids of the messages the texts belong to
+            texts: The texts to embed
+
+        Returns:
+            int: Number of rows appended
+        """
+        if not texts:
+            return 0
+        with metrics.timer("retrieval_embed_seconds"):
+            vectors = self.embedder.embed(texts)
+        return self.add_vectors(message_ids, vectors)
+
+    def add_vectors(self, message_ids: Sequence[int], vectors: np.ndarray) -> int:
+        """
+        Append already computed vectors.
+
+        Args:
+            message_ids: Increasing ids, one per row
+            vectors: Array of shape (len(message_ids), dim); rows are normalized here
+
+        Returns:
+            int: Number of rows appended
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        ids = np.asarray(message_ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError("Need exactly one message id per vector")
+        if not len(ids):
+            return 0
+
+        with self._lock:
+            with open(self._vectors_path, 'ab') as f:
+                f.write(vectors.astype(np.float32).tobytes())
+            with open(self._ids_path, 'ab') as f:
+                f.write(ids.tobytes())
+            self.count += len(ids)
+            self.last_id = max(self.last_id, int(ids.max()))
+            # The header is replaced last, so a crash mid-append leaves the old count in charge
+            self._write_header()
+        return len(ids)
+
+    def _write_header(self) -> None:
+        temporary = f"{self._header_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({
+                "dim": self.dim,
+                "count": self.count,
+                "last_id": self.last_id,
+                "embedder": self.embedder.name,
+            }, f)
+        os.replace(temporary, self._header_path)
+
+    def sync(self, message_db, roles: Iterable[str] = ("assistant",), batch_size: int = 1000) -> int:
+        """
+        Index the stored messages added since the last sync.
+
+        Args:
+            message_db: The MessageDatabase to read from
+            roles: Roles of the messages to index; answers are what retrieval is for
+            batch_size: Messages embedded per step
+
+        Returns:
+            int: Number of messages indexed
+        """
+        roles = set(roles)
+        indexed = 0
+        with self._sync_lock:
+            after_id = self.last_id
+            while not self._stop_sync.is_set():
+                rows = message_db.get_messages_page(
+                    limit=batch_size,
+                    after_id=after_id,
+                    columns=["id", "role", "content"]
+                )
+                if not rows:
+                    break
+                after_id = rows[-1][0]
+                selected = [(message_id, content) for message_id, role, content in rows if role in roles]
+                if selected:
+                    indexed += self.add([message_id for message_id, _ in selected], [content for _, content in selected])
+                if len(rows) < batch_size:
+                    break
+
+            # Skip the messages of other roles next time too
+            if after_id > self.last_id:
+                with self._lock:
+                    self.last_id = after_id
+                    self._write_header()
+        return indexed
+
+    def sync_in_background(self, message_db, roles: Iterable[str] = ("assistant",)) -> None:
+        """
+        Run sync() on a daemon thread, keeping embedding off the caller's path.
+
+        A call while a sync is running schedules one more pass, so messages
+        stored meanwhile are picked up. Searches see the rows indexed so far.
+        """
+        with self._lock:
+            if self._stop_sync.is_set():
+                return
+            self._sync_requested = True
+            if self._sync_thread is not None:
+                return
+            self._sync_thread = threading.Thread(
+                target=self._sync_loop,
+                args=(message_db, tuple(roles)),
+                name="VectorIndexSync",
+                daemon=True
+            )
+            self._sync_thread.start()
+
+    def _sync_loop(self, message_db, roles: Tuple[str, ...]) -> None:
+        while True:
+            with self._lock:
+                if not self._sync_requested:
+                    self._sync_thread = None
+                    return
+                self._sync_requested = False
+            try:
+                self.sync(message_db, roles)
+            except Exception as e:
+                print(f"Error indexing messages: {e}")
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Wait for a background sync to finish."""
+        with self._lock:
+            thread = self._sync_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _mapped(self) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """Return the memory maps of the vectors and ids, remapping after appends."""
+        with self._lock:
+            if self.count == 0:
+                return None, None
+            if self._mapped_count != self.count:
+                self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+                self._ids = np.memmap(self._ids_path, dtype=np.int64, mode='r', shape=(self.count,))
+                self._mapped_count = self.count
+            return self._vectors, self._ids
+
+    def search(self, query, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        Find the indexed messages most similar to a query.
+
+        Args:
+            query: Query text, or a vector of the index's dimension
+            k: Number of results
+
+        Returns:
+            List of (message_id, cosine similarity) tuples, most similar first
+        """
+        vectors, ids = self._mapped()
+        if vectors is None or k <= 0:
+            return []
+        if isinstance(query, str):
+            query = self.embedder.embed([query])[0]
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, self.dim))[0]
+
+        with metrics.timer("retrieval_search_seconds"):
+            # Score a chunk at a time and keep only each chunk's best k
+            best_scores = []
+            best_rows = []
+            for start in range(0, len(vectors), self.chunk_rows):
+                scores = vectors[start:start + self.chunk_rows] @ query
+                if len(scores) > k:
+                    top = np.argpartition(scores, -k)[-k:]
+                else:
+                    top = np.arange(len(scores))
+                best_scores.append(scores[top])
+                best_rows.append(top + start)
+            scores = np.concatenate(best_scores)
+            rows = np.concatenate(best_rows)
+            order = np.argsort(-scores)[:k]
+            return [(int(ids[rows[i]]), float(scores[i])) for i in order]
+
+    def close(self) -> None:
+        """Stop a background sync after its current batch and release the memory maps."""
+        self._stop_sync.set()
+        self.wait()
+        with self._lock:
+            self._vectors = None
+            self._ids = None
+            self._mapped_count = 0
@@ -1,3 +1,22 @@
-from .ChatBotWindow import ChatBotWindow
-from .MessageDatabase import MessageDatabase
-from .ChatBot import ChatBot
\ No newline at end of file
+import importlib
+import sys
+import types
+
+# Public classes, each living in the submodule of the same name. They are
+# imported on first use, so headless users never pay for PyQt6 or the OpenAI SDK.
+__all__ = ["ChatBotWindow", "MessageDatabase", "ChatBot", "AsyncChatBot"]
+
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module(f".{name}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it on the package under the same name as
+        # its class; keep `from classes import ChatBot` returning the class
+        if name in __all__ and isinstance(value, types.ModuleType) and value.__name__ == f"{__name__}.{name}":
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
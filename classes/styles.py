@@ -32,6 +32,16 @@ STYLES = {
             font-size: 14px;
         }
     """,
+    "chat_view": """
+        QListView {
+            border: 1px solid #555;
+            border-radius: 4px;
+            padding: 8px;
+            background-color: #1E1E1E;
+            color: #ffffff;
+            font-size: 14px;
+        }
+    """,
     "input_field": """
         QTextEdit {
             border: 1px solid #555;
@@ -74,6 +84,26 @@ STYLES = {
             background-color: #a52834;
         }
     """,
+    "stop_button": """
+        QPushButton {
+            background-color: #6c757d;
+            color: white;
+            border: none;
+            border-radius: 4px;
+            padding: 8px 16px;
+            font-size: 14px;
+        }
+        QPushButton:hover {
+            background-color: #5c636a;
+        }
+        QPushButton:pressed {
+            background-color: #565e64;
+        }
+        QPushButton:disabled {
+            background-color: #495057;
+            color: #adb5bd;
+        }
+    """,
     "message_styles": {
         "user": f"""
             <div style='
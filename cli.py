@@ -0,0 +1,139 @@
+import argparse
+import sys
+from dotenv import load_dotenv
+
+def run_batch(args) -> int:
+    from classes.ChatBot import ChatBotConfig
+    from classes.BatchRunner import BatchRunner
+    from classes.Metrics import metrics
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    config = ChatBotConfig(
+        model=args.model,
+        temperature=args.temperature,
+        max_tokens=args.max_tokens,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm
+    )
+    runner = BatchRunner(config, parallelism=args.parallelism, db_path=args.db)
+    try:
+        stats = runner.run(args.input, args.output, resume=not args.no_resume)
+    finally:
+        runner.close()
+
+    print(f"Completed: {stats['completed']}, failed: {stats['failed']}, skipped: {stats['skipped']}")
+    if args.show_metrics:
+        print(metrics.format_summary())
+    return 1 if stats["failed"] else 0
+
+def run_import(args) -> int:
+    from classes.MessageDatabase import MessageDatabase
+    from classes.TranscriptImporter import TranscriptImporter
+
+    message_db = MessageDatabase(args.db)
+    try:
+        stats = TranscriptImporter(message_db, batch_size=args.batch_size).import_files(args.paths)
+    finally:
+        message_db.close()
+
+    print(
+        f"Imported: {stats['imported']}, duplicates: {stats['duplicates']}, "
+        f"empty: {stats['empty']}, failed: {stats['failed']}"
+    )
+    return 1 if stats["failed"] else 0
+
+def run_export(args) -> int:
+    from classes.MessageDatabase import MessageDatabase
+    from classes.ChatExporter import ChatExporter
+
+    message_db = MessageDatabase(args.db)
+    try:
+        count = ChatExporter(message_db, chunk_size=args.chunk_size).export(
+            args.output, conversation_id=args.conversation, fmt=args.format
+        )
+    except Exception as e:
+        print(f"Error exporting messages: {e}")
+        return 1
+    finally:
+        message_db.close()
+
+    print(f"Exported {count} messages to {args.output}")
+    return 0
+
+def run_index(args) -> int:
+    from classes.MessageDatabase import MessageDatabase
+    from classes.VectorIndex import HashingEmbedder, OpenAIEmbedder, VectorIndex
+
+    if args.embedder == "openai":
+        embedder = OpenAIEmbedder(model=args.model, dim=args.dim)
+    else:
+        embedder = HashingEmbedder(dim=args.dim)
+    message_db = MessageDatabase(args.db)
+    index = None
+    try:
+        index = VectorIndex(args.index or f"{args.db}.vectors", embedder)
+        count = index.sync(message_db, roles=args.roles.split(","), batch_size=args.batch_size)
+    except Exception as e:
+        print(f"Error indexing messages: {e}")
+        return 1
+    finally:
+        if index is not None:
+            index.close()
+        message_db.close()
+
+    print(f"Indexed {count} new messages ({len(index)} in total)")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Headless tools for Python-Playing-With-LLM")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser("batch", help="Run prompts from a JSONL or CSV file")
+    batch.add_argument("input", help="Prompt file (.jsonl with id/prompt fields, or .csv with id,prompt columns)")
+    batch.add_argument("output", help="Results file (.jsonl); also used as the resume checkpoint")
+    batch.add_argument("-p", "--parallelism", type=int, default=4, help="Prompts processed concurrently")
+    batch.add_argument("--model", default="gpt-3.5-turbo")
+    batch.add_argument("--temperature", type=float, default=0.7)
+    batch.add_argument("--max-tokens", type=int, default=None)
+    batch.add_argument("--rpm", type=int, default=None, help="Requests per minute limit")
+    batch.add_argument("--tpm", type=int, default=None, help="Tokens per minute limit")
+    batch.add_argument("--db", default="llmdb.db", help="Database the conversations are stored in")
+    batch.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    batch.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port while running")
+    batch.add_argument("--show-metrics", action="store_true", help="Print latency percentiles and counters when done")
+    batch.set_defaults(func=run_batch)
+
+    importer = subparsers.add_parser("import", help="Import legacy messages_self_*.json transcripts")
+    importer.add_argument("paths", nargs="*", default=["data"], help="Transcript files, directories or glob patterns")
+    importer.add_argument("--batch-size", type=int, default=500, help="Files stored per transaction")
+    importer.add_argument("--db", default="llmdb.db", help="Database to import into")
+    importer.set_defaults(func=run_import)
+
+    exporter = subparsers.add_parser("export", help="Export stored messages to JSONL, compressed JSONL or Parquet")
+    exporter.add_argument("output", help="Output file; the format follows the suffix (.jsonl, .jsonl.gz, .jsonl.zst, .parquet)")
+    exporter.add_argument("-c", "--conversation", type=int, default=None, help="Only export this conversation ID")
+    exporter.add_argument("--format", choices=["jsonl", "jsonl.gz", "jsonl.zst", "parquet"], default=None,
+                          help="Override the format detected from the suffix")
+    exporter.add_argument("--chunk-size", type=int, default=1000, help="Messages read and written at a time")
+    exporter.add_argument("--db", default="llmdb.db", help="Database to export from")
+    exporter.set_defaults(func=run_export)
+
+    indexer = subparsers.add_parser("index", help="Add new messages to the vector index used for retrieval")
+    indexer.add_argument("--db", default="llmdb.db", help="Database to index")
+    indexer.add_argument("--index", default=None, help="Index base path (default <db>.vectors)")
+    indexer.add_argument("--embedder", choices=["hashing", "openai"], default="hashing",
+                         help="Local hashing embedder or the OpenAI embeddings API")
+    indexer.add_argument("--model", default="text-embedding-3-small", help="OpenAI embedding model")
+    indexer.add_argument("--dim", type=int, default=256, help="Embedding dimensions")
+    indexer.add_argument("--roles", default="assistant", help="Comma separated roles to index")
+    indexer.add_argument("--batch-size", type=int, default=1000, help="Messages embedded at a time")
+    indexer.set_defaults(func=run_index)
+
+    return parser
+
+if __name__ == '__main__':
+    load_dotenv()
+    args = build_parser().parse_args()
+    sys.exit(args.func(args))
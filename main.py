@@ -1,12 +1,36 @@
+import time
+
+# Taken before any other import so the startup timings cover them
+STARTED = time.perf_counter()
+
 from dotenv import load_dotenv
 from classes import ChatBotWindow
+from classes.Metrics import metrics
 from PyQt6.QtWidgets import QApplication
+import os
 import sys
 
+def record_startup(name: str) -> None:
+    elapsed = time.perf_counter() - STARTED
+    metrics.observe(name, elapsed)
+    if os.getenv("STARTUP_TIMING"):
+        print(f"{name}: {elapsed * 1000:.0f} ms")
+
 if __name__ == '__main__':
     # Load environment variables at application startup
     load_dotenv()
     
+    # Optional instrumentation: a Prometheus endpoint and/or a periodic log
+    if os.getenv("METRICS_PORT"):
+        metrics.serve(int(os.getenv("METRICS_PORT")))
+    if os.getenv("METRICS_LOG_INTERVAL"):
+        metrics.start_logging(float(os.getenv("METRICS_LOG_INTERVAL")))
+    
     app = QApplication(sys.argv)
     window = ChatBotWindow()
+    record_startup("startup_window_shown_seconds")
+    window.ready.connect(lambda: record_startup("startup_ready_seconds"))
+    # STARTUP_TIMING=exit measures a cold start and quits once history is loaded
+    if os.getenv("STARTUP_TIMING") == "exit":
+        window.ready.connect(window.close)
     sys.exit(app.exec())
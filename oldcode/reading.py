@@ -1,4 +1,5 @@
 import json
+from itertools import zip_longest
 
 def read_json_and_print(file_path):
     with open(file_path, 'r') as json_file:
@@ -15,14 +16,12 @@ def read_json_and_print(file_path):
             elif role == "assistant":
                 assistant_messages.append({"role": role, "content": content})
 
-        while user_messages or assistant_messages:
-            if user_messages:
-                user_msg = user_messages.pop(0)
+        for user_msg, assistant_msg in zip_longest(user_messages, assistant_messages):
+            if user_msg:
                 print(f"Role: {user_msg['role']}")
                 print(f"Content: {user_msg['content']}\n")
 
-            if assistant_messages:
-                assistant_msg = assistant_messages.pop(0)
+            if assistant_msg:
                 print(f"Role: {assistant_msg['role']}")
                 print(f"Content: {assistant_msg['content']}\n")
 